@@ -5,15 +5,173 @@
 
 # TODO(roscoelai): Normalize dataset before optimization (how?)
 # TODO(roscoelai): Multi-record test cases (N > 2)
-# TODO(roscoelai): Define 'step'
-# TODO(roscoelai): Define 'epoch'
+
+# Terminology:
+# - step: one update of the weights, using the gradient of one (mini-)batch
+# - epoch: one pass over the whole dataset, i.e. ceil(N / batch_size) steps
+# - cycle: one epoch of full-batch gradient descent (1 epoch == 1 step)
 
 from __future__ import annotations
 
+import array
+import itertools
 import math
 import random
+import time
 import unittest
-from typing import Callable
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Callable, Iterable
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+BACKENDS = ("python", "numpy")
+
+class CSR():
+    """Compressed sparse rows: the non-zeros of row i are data[p:q] in
+    columns indices[p:q], where p, q = indptr[i], indptr[i + 1]."""
+    def __init__(self, indptr: list[int], indices: list[int], data: list[float], n_cols: int):
+        assert len(indices) == len(data) == indptr[-1]
+        self.indptr = list(indptr)
+        self.indices = list(indices)
+        self.data = list(data)
+        self.n_cols = n_cols
+        self._arrays = None
+        self._pairs = None
+
+    @classmethod
+    def from_dense(self, x: list[list[float]]) -> CSR:
+        return self.from_rows([{j: x_ij for j, x_ij in enumerate(x_i) if x_ij} for x_i in x],
+                              len(x[0]) if len(x) else 0)
+
+    @classmethod
+    def from_rows(self, rows: list[dict[int, float]], n_cols: int) -> CSR:
+        """From one {column: value} dict per row."""
+        indptr, indices, data = [0], [], []
+        for row in rows:
+            for j in sorted(row):
+                indices.append(j)
+                data.append(row[j])
+            indptr.append(len(indices))
+        return self(indptr, indices, data, n_cols)
+
+    def __len__(self) -> int:
+        return len(self.indptr) - 1
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return len(self), self.n_cols
+
+    def row(self, i: int) -> tuple[list[int], list[float]]:
+        p, q = self.indptr[i], self.indptr[i + 1]
+        return self.indices[p:q], self.data[p:q]
+
+    def take(self, rows: Iterable[int]) -> CSR:
+        indptr, indices, data = [0], [], []
+        for i in rows:
+            idx, val = self.row(i)
+            indices += idx
+            data += val
+            indptr.append(len(indices))
+        return CSR(indptr, indices, data, self.n_cols)
+
+    def to_dense(self) -> list[list[float]]:
+        res = []
+        for i in range(len(self)):
+            x_i = [0] * self.n_cols
+            for j, v in zip(*self.row(i)):
+                x_i[j] = v
+            res.append(x_i)
+        return res
+
+    def np_arrays(self) -> tuple:
+        """(row_ids, indices, data) as numpy arrays, built once."""
+        if self._arrays is None:
+            row_ids = np.repeat(np.arange(len(self)), np.diff(self.indptr))
+            self._arrays = row_ids, np.array(self.indices, dtype=int), np.array(self.data, dtype=float)
+        return self._arrays
+
+    def np_pairs(self) -> tuple:
+        """(row_ids, cells, products) over every pair of non-zeros within a
+        row, cells = j * n_cols + k, as numpy arrays, built once."""
+        if self._pairs is None:
+            _, indices, data = self.np_arrays()
+            indptr = np.array(self.indptr, dtype=int)
+            nnz = np.diff(indptr)
+            counts = nnz * nnz
+            row_ids = np.repeat(np.arange(len(self)), counts)
+            t = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+            a = indptr[row_ids] + t // nnz[row_ids]
+            b = indptr[row_ids] + t % nnz[row_ids]
+            self._pairs = row_ids, indices[a] * self.n_cols + indices[b], data[a] * data[b]
+        return self._pairs
+
+    def gram(self, d):
+        """x' . diag(d) . x (numpy), in O(sum of squared row nnz)."""
+        row_ids, cells, products = self.np_pairs()
+        m = self.n_cols
+        return np.bincount(cells, weights=products * d[row_ids], minlength=m * m).reshape(m, m)
+
+    def matvec(self, w):
+        """x . w, in O(nnz)."""
+        if np is not None and isinstance(w, np.ndarray):
+            row_ids, indices, data = self.np_arrays()
+            return np.bincount(row_ids, weights=data * w[indices], minlength=len(self))
+        return [sum(v * w[j] for j, v in zip(*self.row(i))) for i in range(len(self))]
+
+    def rmatvec(self, v):
+        """x' . v, in O(nnz)."""
+        if np is not None and isinstance(v, np.ndarray):
+            row_ids, indices, data = self.np_arrays()
+            return np.bincount(indices, weights=data * v[row_ids], minlength=self.n_cols)
+        res = [0.0] * self.n_cols
+        for i, v_i in enumerate(v):
+            for j, x_ij in zip(*self.row(i)):
+                res[j] += x_ij * v_i
+        return res
+
+def parse_redcap_opts(opts: str) -> dict[str, str]:
+    """'1, a | 2, b' -> {'1': 'a', '2': 'b'} (REDCap choices format)."""
+    pairs = (opt.split(",", 1) for opt in opts.split("|") if opt.strip())
+    return {k.strip(): v.strip() for k, v in pairs}
+
+def encode_redcap(records: list[dict], fields: dict[str, str], numeric: list[str] | None=None) -> tuple[CSR, list[str]]:
+    """
+    One-hot encode REDCap-style categorical fields straight into CSR.
+
+    fields maps field name to its choices string ('1, Yes | 0, No'). A record
+    value may be a single code (radio/dropdown) or a collection of codes
+    (checkbox). Columns are named like REDCap checkbox exports: field___code.
+    Fields in numeric are passed through as one column each. Blank/unknown
+    values contribute no non-zeros.
+    """
+    numeric = numeric or []
+    colnames = list(numeric)
+    col_idx = {}
+    for field, opts in fields.items():
+        for code in parse_redcap_opts(opts):
+            col_idx[field, code] = len(colnames)
+            colnames.append(f"{field}___{code}")
+    rows = []
+    for rec in records:
+        row = {j: float(rec[k]) for j, k in enumerate(numeric) if rec.get(k) not in (None, "")}
+        row = {j: v for j, v in row.items() if v}
+        for field in fields:
+            values = rec.get(field)
+            if values is None:
+                continue
+            if isinstance(values, (str, int, float)):
+                values = [values]
+            for value in values:
+                if isinstance(value, float) and value.is_integer():
+                    value = int(value)
+                if (j := col_idx.get((field, str(value).strip()))) is not None:
+                    row[j] = 1
+        rows.append(row)
+    return CSR.from_rows(rows, len(colnames)), colnames
 
 class LogReg():
     def __init__(
@@ -23,19 +181,29 @@ class LogReg():
         activation: Callable | None=None,
         loss_fn: Callable | None=None,
         learning_rate: float=0.5,
-        threshold: float=1e-5
+        threshold: float=1e-5,
+        backend: str="python",
+        fused: bool=False
     ):
+        if backend not in BACKENDS:
+            raise ValueError(f"Invalid backend: {backend!r}, expected one of {BACKENDS}")
+        if backend == "numpy" and np is None:
+            raise ImportError("backend='numpy' requires numpy")
+        self.backend = backend
         if w is None and n is not None:
             random.seed(42)
             self.w = [random.random() for _ in range(n)]
         else:
             self.w = w
+        if backend == "numpy" and self.w is not None:
+            self.w = np.array(self.w, dtype=float).ravel()
         if activation is None:
             self.activation = self.sigmoid
             self.activation_grad_fn = self.sigmoid_grad
         if loss_fn is None:
             self.loss_fn = self.bce
             self.loss_grad_fn = self.bce_grad
+        self.fused = fused
         self.learning_rate = learning_rate
         self.threshold = threshold
 
@@ -59,6 +227,58 @@ class LogReg():
         """Domain: (0, 1), Range: (-Inf, -1) if y == 1, (1, Inf) if y == 0"""
         return ((1 - y) / (1 - g)) - (y / g)
 
+    # Fused kernels, in logit (z) space. Sigmoid followed by BCE simplifies to
+    # L = softplus(z) - y * z and dL/dz = sigmoid(z) - y, which never takes
+    # log(0) or divides by (1 - g), and skip the chain-rule intermediates.
+
+    @classmethod
+    def sigmoid_stable(self, x: float) -> float:
+        """Sigmoid without overflow for large negative x."""
+        if x >= 0:
+            return 1 / (1 + math.exp(-x))
+        e = math.exp(x)
+        return e / (1 + e)
+
+    @classmethod
+    def softplus(self, x: float) -> float:
+        """log(1 + exp(x)), Domain: (-Inf, Inf), Range: (0, Inf)"""
+        return max(x, 0) + math.log1p(math.exp(-abs(x)))
+
+    @classmethod
+    def log_sigmoid(self, x: float) -> float:
+        """log(sigmoid(x)) == -softplus(-x), Range: (-Inf, 0)"""
+        return -self.softplus(-x)
+
+    @classmethod
+    def bce_logits(self, z: float, y: int) -> float:
+        """bce(sigmoid(z), y)"""
+        return self.softplus(z) - y * z
+
+    @classmethod
+    def bce_logits_grad(self, z: float, y: int) -> float:
+        """d/dz bce(sigmoid(z), y), Range: (-1, 1)"""
+        return self.sigmoid_stable(z) - y
+
+    @staticmethod
+    def sigmoid_np(z):
+        return np.exp(-np.logaddexp(0, -z))
+
+    @staticmethod
+    def softplus_np(z):
+        return np.logaddexp(0, z)
+
+    @staticmethod
+    def log_sigmoid_np(z):
+        return -np.logaddexp(0, -z)
+
+    @staticmethod
+    def bce_logits_np(z, y):
+        return np.logaddexp(0, z) - y * z
+
+    @classmethod
+    def bce_logits_grad_np(self, z, y):
+        return self.sigmoid_np(z) - y
+
     @classmethod
     def dotprod(self, x: list[float], y: list[float]) -> float:
         """Dot (inner) product."""
@@ -73,6 +293,25 @@ class LogReg():
             return [[self.dotprod(x_i, y)] for x_i in x]
         return [[self.dotprod(x_i, y_j) for y_j in zip(*y)] for x_i in x]
 
+    @classmethod
+    def solve(self, a: list[list[float]], b: list[float]) -> list[float]:
+        """Solve a.x = b by Gaussian elimination with partial pivoting."""
+        n = len(b)
+        assert len(a) == n and all(len(a_i) == n for a_i in a)
+        m = [list(a_i) + [b_i] for a_i, b_i in zip(a, b)]
+        for j in range(n):
+            p = max(range(j, n), key=lambda i: abs(m[i][j]))
+            if m[p][j] == 0:
+                raise ZeroDivisionError("Singular matrix")
+            m[j], m[p] = m[p], m[j]
+            for i in range(j + 1, n):
+                f = m[i][j] / m[j][j]
+                m[i] = [m_ik - f * m_jk for m_ik, m_jk in zip(m[i], m[j])]
+        x = [0.0] * n
+        for j in reversed(range(n)):
+            x[j] = (m[j][n] - self.dotprod(m[j][j + 1:n], x[j + 1:])) / m[j][j]
+        return x
+
     @classmethod
     def scale_range(self, x: list[list[float]]) -> list[list[float]]:
         cols = list(zip(*x))
@@ -88,11 +327,25 @@ class LogReg():
 
     def calc_z(self, x: list[list[float]], w: list | None=None) -> list[float]:
         """x: (n x m), x1: (n x (m+1)), w: ((m+1) x k), z: (n x k), k = 1"""
+        if isinstance(x, CSR):
+            if w is None:
+                w = self.w
+            if self.backend == "numpy":
+                w = np.asarray(w, dtype=float).ravel()
+                self.z = w[0] + x.matvec(w[1:])
+            else:
+                w = [w_j[0] if isinstance(w_j, list) else w_j for w_j in w]
+                self.z = [w[0] + z_i for z_i in x.matvec(w[1:])]
+            return self.z
+        if self.backend == "numpy":
+            w = np.asarray(self.w if w is None else w, dtype=float).ravel()
+            self.z = w[0] + np.asarray(x, dtype=float) @ w[1:]
+            return self.z
         x1 = [[1] + list(x_i) for x_i in x]
         if w is None:
             w = self.w
         if isinstance(w[0], (float, int)):
-            w = [[w_j] for w_j in self.w]
+            w = [[w_j] for w_j in w]
         z = self.matmul(x1, w)
         self.z = list(next(zip(*z)))  # k = 1
         return self.z
@@ -101,7 +354,12 @@ class LogReg():
         """z: (n x k), g: (n x k), k = 1"""
         if z is None:
             z = self.z
-        g = [self.activation(z_i) for z_i in z]
+        if self.backend == "numpy":
+            z = np.asarray(z, dtype=float)
+            self.g = self.sigmoid_np(z) if self.fused else 1 / (1 + np.exp(-z))
+            return self.g
+        activation = self.sigmoid_stable if self.fused else self.activation
+        g = [activation(z_i) for z_i in z]
         self.g = g
         return self.g
 
@@ -111,9 +369,19 @@ class LogReg():
         return g
 
     def calc_loss(self, y: list[int], g: list[float] | None=None) -> list[float]:
-        """y: (n x 1), g: (n x k), k = 1"""
+        """y: (n x 1), g: (n x k), k = 1. If fused, computed from self.z."""
+        if self.fused:
+            if self.backend == "numpy":
+                self.loss = self.bce_logits_np(self.z, np.asarray(y, dtype=float))
+            else:
+                self.loss = [self.bce_logits(z_i, y_i) for z_i, y_i in zip(self.z, y)]
+            return self.loss
         if g is None:
             g = self.g
+        if self.backend == "numpy":
+            g, y = np.asarray(g, dtype=float), np.asarray(y, dtype=float)
+            self.loss = -(y * np.log(g) + (1 - y) * np.log(1 - g))
+            return self.loss
         self.loss = [self.loss_fn(g_i, y_i) for g_i, y_i in zip(g, y)]
         return self.loss
 
@@ -121,6 +389,10 @@ class LogReg():
         """y: (n x 1), g: (n x k), k = 1"""
         if g is None:
             g = self.g
+        if self.backend == "numpy":
+            g, y = np.asarray(g, dtype=float), np.asarray(y, dtype=float)
+            self.grad_loss = ((1 - y) / (1 - g)) - (y / g)
+            return self.grad_loss
         self.grad_loss = [self.loss_grad_fn(g_i, y_i) for g_i, y_i in zip(g, y)]
         return self.grad_loss
 
@@ -128,6 +400,10 @@ class LogReg():
         """g: (n x k), k = 1"""
         if g is None:
             g = self.g
+        if self.backend == "numpy":
+            g = np.asarray(g, dtype=float)
+            self.grad_activation = g * (1 - g)
+            return self.grad_activation
         self.grad_activation = [self.activation_grad_fn(g_i) for g_i in g]
         return self.grad_activation
 
@@ -135,9 +411,31 @@ class LogReg():
         """x: (n x m), y: (n x 1), g: (n x k), k = 1"""
         if g is None:
             g = self.g
-        dL_dgs = self.calc_grad_loss(y, g)
-        dg_dzs = self.calc_grad_activation(g)
-        common_terms = [dL_dg * dg_dz for dL_dg, dg_dz in zip(dL_dgs, dg_dzs)]
+        if self.backend == "numpy":
+            if self.fused:
+                # dL/dz directly, instead of dL/dg * dg/dz.
+                common_terms = np.asarray(g, dtype=float) - np.asarray(y, dtype=float)
+            else:
+                common_terms = self.calc_grad_loss(y, g) * self.calc_grad_activation(g)
+        elif self.fused:
+            common_terms = [g_i - y_i for g_i, y_i in zip(g, y)]
+        else:
+            dL_dgs = self.calc_grad_loss(y, g)
+            dg_dzs = self.calc_grad_activation(g)
+            common_terms = [dL_dg * dg_dz for dL_dg, dg_dz in zip(dL_dgs, dg_dzs)]
+        if isinstance(x, CSR):
+            # Sparse: accumulate over non-zeros only, and return the mean
+            # gradient as a single row (update_w averages rows).
+            n = len(x)
+            if self.backend == "numpy":
+                self.grads = np.concatenate([[common_terms.sum()], x.rmatvec(common_terms)])[None, :] / n
+            else:
+                self.grads = [[sum(common_terms) / n] + [t / n for t in x.rmatvec(common_terms)]]
+            return self.grads
+        if self.backend == "numpy":
+            x = np.asarray(x, dtype=float)
+            self.grads = np.column_stack([common_terms, common_terms[:, None] * x])
+            return self.grads
         all_grads = []
         for common_term, x_i in zip(common_terms, x):
             grads = [common_term]
@@ -152,29 +450,426 @@ class LogReg():
             grads = self.grads
         if learning_rate is None:
             learning_rate = self.learning_rate
-        for i, _ in enumerate(self.w):
-            grads_t = list(zip(*grads))[i]
+        if self.backend == "numpy":
+            self.w -= np.asarray(grads).mean(axis=0) * learning_rate
+            return None
+        for i, grads_t in enumerate(zip(*grads)):
             mean_grad = sum(grads_t) / len(grads_t)
             self.w[i] -= mean_grad * learning_rate
 
-    def fit(self, x: list[list[float]], y: list[int], learning_rate: float | None=None, threshold: float | None=None, max_cycles: int | None=None) -> int:
+    def fit(
+        self,
+        x: list[list[float]],
+        y: list[int],
+        learning_rate: float | None=None,
+        threshold: float | None=None,
+        max_cycles: int | None=None,
+        batch_size: int | None=None,
+        shuffle: bool=True,
+        seed: int | None=42
+    ) -> int:
+        """Full-batch gradient descent, or mini-batch/stochastic gradient
+        descent if batch_size is given (max_cycles then counts epochs).
+        See fit_newton() and fit_lbfgs() for second-order solvers."""
         if learning_rate is None:
             learning_rate = self.learning_rate
         if threshold is None:
             threshold = self.threshold
         if max_cycles is None:
             max_cycles = 20000
+        if batch_size is not None:
+            rng = random.Random(seed)
+            batches = lambda: self.iter_batches(x, y, batch_size, shuffle, rng)
+            return self.fit_batches(batches, learning_rate, threshold, max_cycles)
+        if self.backend == "numpy":
+            self._fit_numpy(x, y, learning_rate, threshold, max_cycles)
+            self.epochs = self.steps = self.cycles
+            return self.cycles
         for i in range(max_cycles):
             g = self.predict(x)
             loss = self.calc_loss(y, g)
             if sum(loss) < threshold:
-                self.cycles = i
+                self.cycles = self.epochs = self.steps = i
                 return i
             grads = self.calc_grads(x, y, g)
             self.update_w(grads, learning_rate)
+        self.cycles = self.epochs = self.steps = i + 1
+        return i + 1
+
+    @classmethod
+    def iter_batches(self, x, y, batch_size: int, shuffle: bool=True, rng: random.Random | None=None) -> Iterable[tuple]:
+        """Yield (x_batch, y_batch) covering the dataset once (one epoch)."""
+        if batch_size < 1:
+            raise ValueError(f"Invalid batch_size: {batch_size}")
+        idx = list(range(len(y)))
+        if shuffle:
+            (rng or random.Random(42)).shuffle(idx)
+        is_array = np is not None and isinstance(x, np.ndarray)
+        for start in range(0, len(idx), batch_size):
+            batch = idx[start:start + batch_size]
+            if isinstance(x, CSR):
+                yield x.take(batch), [y[i] for i in batch]
+            elif is_array:
+                yield x[batch], np.asarray(y)[batch]
+            else:
+                yield [x[i] for i in batch], [y[i] for i in batch]
+
+    def fit_batches(
+        self,
+        batches: Callable[[], Iterable[tuple]] | Iterable[tuple],
+        learning_rate: float | None=None,
+        threshold: float | None=None,
+        max_epochs: int=1
+    ) -> int:
+        """Mini-batch gradient descent over batches of (x_batch, y_batch).
+
+        batches is either a callable returning a fresh iterable per epoch
+        (e.g. reading a file in chunks), or a single iterable, which is
+        consumed once (i.e. one epoch). Only one batch is held in memory.
+
+        Stops at the end of the first epoch whose summed batch losses
+        (each evaluated before its step) fall below threshold."""
+        if learning_rate is None:
+            learning_rate = self.learning_rate
+        if threshold is None:
+            threshold = self.threshold
+        if not callable(batches):
+            batches, max_epochs = (lambda it=batches: it), 1
+        self.steps = 0
+        for epoch in range(max_epochs):
+            epoch_loss = 0.0
+            for x_b, y_b in batches():
+                g = self.predict(x_b)
+                loss = self.calc_loss(y_b, g)
+                epoch_loss += float(loss.sum()) if self.backend == "numpy" else sum(loss)
+                self.update_w(self.calc_grads(x_b, y_b, g), learning_rate)
+                self.steps += 1
+            if epoch_loss < threshold:
+                self.cycles = self.epochs = epoch + 1
+                return self.epochs
+        self.cycles = self.epochs = max_epochs
+        return self.epochs
+
+    def mean_loss_grad(self, x, y, w: list[float], hessian: bool=False) -> tuple:
+        """Mean loss, mean gradient and (optionally) Hessian of the mean loss
+        at w. The Hessian assumes the default sigmoid/bce pairing, for which
+        d2L/dz2 == sigmoid_grad(g)."""
+        g = self.calc_g(self.calc_z(x, w))
+        loss = self.calc_loss(y, g)
+        grads = self.calc_grads(x, y, g)
+        n = len(y)
+        if self.backend == "numpy":
+            hess = None
+            if hessian and isinstance(x, CSR):
+                # [1 | x]' . diag(d) . [1 | x], block by block, from the non-zeros.
+                d = self.calc_grad_activation(g)
+                hess = np.empty((x.n_cols + 1, x.n_cols + 1))
+                hess[0, 0] = d.sum()
+                hess[0, 1:] = hess[1:, 0] = x.rmatvec(d)
+                hess[1:, 1:] = x.gram(d)
+                hess /= n
+            elif hessian:
+                x1 = np.column_stack([np.ones(n), np.asarray(x, dtype=float)])
+                hess = (x1.T * self.calc_grad_activation(g)) @ x1 / n
+            return float(loss.sum()) / n, grads.mean(axis=0).tolist(), hess
+        grad = [sum(col) / len(grads) for col in zip(*grads)]
+        hess = None
+        if hessian and isinstance(x, CSR):
+            # Sum of outer products over each row's non-zeros (plus bias).
+            d = self.calc_grad_activation(g)
+            hess = [[0.0] * len(w) for _ in w]
+            for i, d_i in enumerate(d):
+                idx, val = x.row(i)
+                idx, val = [0] + [j + 1 for j in idx], [1] + val
+                for j, v_j in zip(idx, val):
+                    for k, v_k in zip(idx, val):
+                        hess[j][k] += d_i * v_j * v_k / n
+        elif hessian:
+            d = self.calc_grad_activation(g)
+            x1 = [[1] + list(x_i) for x_i in x]
+            hess = [[sum(d_i * x1_i[j] * x1_i[k] for d_i, x1_i in zip(d, x1)) / n
+                     for k in range(len(w))] for j in range(len(w))]
+        return sum(loss) / n, grad, hess
+
+    def _line_search(self, x, y, w: list[float], d: list[float], loss: float, slope: float) -> tuple:
+        """Backtracking (Armijo) line search along w - t * d. slope = grad.d"""
+        t = 1.0
+        while t > 1e-10:
+            w_new = [w_j - t * d_j for w_j, d_j in zip(w, d)]
+            try:
+                if self.backend == "numpy":
+                    with np.errstate(all="raise"):
+                        loss_new, grad_new, _ = self.mean_loss_grad(x, y, w_new)
+                else:
+                    loss_new, grad_new, _ = self.mean_loss_grad(x, y, w_new)
+            except (ValueError, ZeroDivisionError, OverflowError, FloatingPointError):
+                loss_new = math.inf  # log(0) etc., step too far
+            if loss_new <= loss - 1e-4 * t * slope:
+                return w_new, loss_new, grad_new
+            t *= 0.5
+        return None
+
+    def _fit_second_order(self, x, y, step_fn: Callable, threshold: float | None, gtol: float, max_iter: int) -> int:
+        if threshold is None:
+            threshold = self.threshold
+        t1 = time.perf_counter()
+        w = [float(w_j) for w_j in self.w]
+        n = len(y)
+        loss, grad, _ = self.mean_loss_grad(x, y, w)
+        i = 0
+        while i < max_iter:
+            if loss * n < threshold or math.sqrt(self.dotprod(grad, grad)) < gtol:
+                break
+            res = step_fn(w, loss, grad)
+            if res is None:
+                break  # No further decrease possible.
+            w_new, loss, grad_new = res
+            self._history_update(w_new, w, grad_new, grad)
+            w, grad = w_new, grad_new
+            i += 1
+        self.w = np.array(w) if self.backend == "numpy" else w
+        self.grad_norm = math.sqrt(self.dotprod(grad, grad))
+        self.fit_time = time.perf_counter() - t1
+        self.cycles = self.epochs = self.steps = self.iterations = i
+        return i
+
+    def _history_update(self, w_new, w, grad_new, grad) -> None:
+        if getattr(self, "_history", None) is None:
+            return None
+        s = [a - b for a, b in zip(w_new, w)]
+        y = [a - b for a, b in zip(grad_new, grad)]
+        if self.dotprod(s, y) > 1e-10:
+            self._history.append((s, y))
+            if len(self._history) > self._history_size:
+                self._history.pop(0)
+
+    def fit_newton(self, x, y, threshold: float | None=None, gtol: float=1e-8, max_iter: int=100, ridge: float=1e-10) -> int:
+        """Newton-Raphson (equivalently, IRLS) with backtracking line search.
+        Converges on gradient norm < gtol or summed loss < threshold. A tiny
+        ridge keeps the Hessian invertible (e.g. N < m+1, separable data)."""
+        def step(w, loss, grad):
+            _, _, hess = self.mean_loss_grad(x, y, w, hessian=True)
+            if self.backend == "numpy":
+                d = np.linalg.solve(hess + ridge * np.eye(len(w)), grad).tolist()
+            else:
+                for j, hess_j in enumerate(hess):
+                    hess_j[j] += ridge
+                d = self.solve(hess, grad)
+            return self._line_search(x, y, w, d, loss, self.dotprod(grad, d))
+        self._history = None
+        return self._fit_second_order(x, y, step, threshold, gtol, max_iter)
+
+    def fit_lbfgs(self, x, y, threshold: float | None=None, gtol: float=1e-8, max_iter: int=500, history_size: int=10) -> int:
+        """Limited-memory BFGS (two-loop recursion) with backtracking line
+        search. Only first derivatives needed, so it scales to many features."""
+        def step(w, loss, grad):
+            q = list(grad)
+            alphas = []
+            for s_k, y_k in reversed(self._history):
+                rho = 1 / self.dotprod(y_k, s_k)
+                a = rho * self.dotprod(s_k, q)
+                q = [q_j - a * y_j for q_j, y_j in zip(q, y_k)]
+                alphas.append((rho, a))
+            if self._history:
+                s_k, y_k = self._history[-1]
+                gamma = self.dotprod(s_k, y_k) / self.dotprod(y_k, y_k)
+                q = [gamma * q_j for q_j in q]
+            for (s_k, y_k), (rho, a) in zip(self._history, reversed(alphas)):
+                b = rho * self.dotprod(y_k, q)
+                q = [q_j + (a - b) * s_j for q_j, s_j in zip(q, s_k)]
+            slope = self.dotprod(grad, q)
+            if slope <= 0:  # Not a descent direction, restart.
+                self._history.clear()
+                q, slope = list(grad), self.dotprod(grad, grad)
+            return self._line_search(x, y, w, q, loss, slope)
+        self._history = []
+        self._history_size = history_size
+        try:
+            return self._fit_second_order(x, y, step, threshold, gtol, max_iter)
+        finally:
+            self._history = None
+
+    def _fit_numpy(self, x, y, learning_rate: float, threshold: float, max_cycles: int) -> int:
+        """Same steps as fit(), on contiguous arrays. The bias column is
+        prepended once, and the per-record gradients are never materialized:
+        mean gradient = x1' . (dL/dg * dg/dz) / n. Sparse (CSR) x never
+        materializes x1 either, so each cycle is O(nnz)."""
+        n = len(x)
+        if isinstance(x, CSR):
+            matvec = lambda w: w[0] + x.matvec(w[1:])
+            rmatvec = lambda v: np.concatenate([[v.sum()], x.rmatvec(v)])
+        else:
+            x1 = np.ascontiguousarray(np.column_stack([np.ones(n), np.asarray(x, dtype=float)]))
+            matvec = lambda w: x1 @ w
+            rmatvec = lambda v: x1.T @ v
+        # If fused, dL/dz = g - y replaces the chain rule.
+        y = np.asarray(y, dtype=float)
+        w = self.w
+        i = -1
+        for i in range(max_cycles):
+            z = matvec(w)
+            if self.fused:
+                g = self.sigmoid_np(z)
+                loss = self.bce_logits_np(z, y)
+            else:
+                g = 1 / (1 + np.exp(-z))
+                loss = -(y * np.log(g) + (1 - y) * np.log(1 - g))
+            if loss.sum() < threshold:
+                self.z, self.g, self.loss = z, g, loss
+                self.cycles = i
+                return i
+            if self.fused:
+                common_terms = g - y
+            else:
+                common_terms = (((1 - y) / (1 - g)) - (y / g)) * (g * (1 - g))
+            w -= rmatvec(common_terms) / n * learning_rate
         self.cycles = i + 1
         return i + 1
 
+# -----------------------------------------------------------------------------
+# Training many models at once (per site, per outcome, per CV fold, ...)
+
+INIT_KWARGS = {"w", "learning_rate", "threshold", "backend", "fused"}
+SOLVERS = {"gd": "fit", "newton": "fit_newton", "lbfgs": "fit_lbfgs"}
+
+def kfold_indices(n: int, k: int=5, shuffle: bool=True, seed: int | None=42) -> list[tuple[list[int], list[int]]]:
+    """(train, test) row indices for each of k folds."""
+    if not 2 <= k <= n:
+        raise ValueError(f"Invalid k: {k}, for n = {n}")
+    idx = list(range(n))
+    if shuffle:
+        random.Random(seed).shuffle(idx)
+    folds = [idx[i::k] for i in range(k)]
+    return [(sorted(itertools.chain(*folds[:i], *folds[i + 1:])), sorted(folds[i])) for i in range(k)]
+
+def _to_shm(x, y) -> tuple[shared_memory.SharedMemory, tuple[int, ...]]:
+    """Copy x (n x m) and y (n) into one shared block of float64: [x | y],
+    and return its shape, (n, m). A CSR x is stored as its arrays,
+    [indptr | indices | data | y], with shape (n, m, nnz)."""
+    if isinstance(x, CSR):
+        n, m, nnz = len(x), x.n_cols, len(x.data)
+        shm = shared_memory.SharedMemory(create=True, size=8 * (2 * n + 1 + 2 * nnz))
+        buf = shm.buf.cast("d")
+        offset = 0
+        for values in (x.indptr, x.indices, x.data, y):
+            buf[offset:offset + len(values)] = array.array("d", map(float, values))
+            offset += len(values)
+        buf.release()
+        return shm, (n, m, nnz)
+    n, m = len(y), len(x[0])
+    shm = shared_memory.SharedMemory(create=True, size=max(8 * n * (m + 1), 1))
+    if np is not None:
+        buf = np.ndarray((n, m + 1), dtype=float, buffer=shm.buf)
+        buf[:, :m] = x
+        buf[:, m] = y
+        del buf
+    else:
+        buf = shm.buf.cast("d")
+        for i, (x_i, y_i) in enumerate(zip(x, y)):
+            buf[i * (m + 1):(i + 1) * (m + 1)] = array.array("d", [*x_i, y_i])
+        buf.release()
+    return shm, (n, m)
+
+def _from_shm(shm: shared_memory.SharedMemory, shape: tuple[int, ...], rows: list[int] | None, backend: str) -> tuple:
+    """Rows of (x, y) from shared memory, as arrays or nested lists (or CSR)."""
+    if len(shape) == 3:
+        n, m, nnz = shape
+        buf = shm.buf.cast("d")
+        indptr = [int(v) for v in buf[:n + 1]]
+        indices = [int(v) for v in buf[n + 1:n + 1 + nnz]]
+        data = buf[n + 1 + nnz:n + 1 + 2 * nnz].tolist()
+        y = buf[n + 1 + 2 * nnz:2 * n + 1 + 2 * nnz].tolist()
+        buf.release()
+        x = CSR(indptr, indices, data, m)
+        if rows is not None:
+            x, y = x.take(rows), [y[i] for i in rows]
+        return x, np.array(y) if backend == "numpy" else y
+    n, m = shape
+    if rows is None:
+        rows = range(n)
+    if backend == "numpy":
+        buf = np.ndarray((n, m + 1), dtype=float, buffer=shm.buf)
+        xy = buf[list(rows)]  # Fancy indexing copies, so buf can be released.
+        del buf
+        return xy[:, :m], xy[:, m]
+    buf = shm.buf.cast("d")
+    xy = [buf[i * (m + 1):(i + 1) * (m + 1)].tolist() for i in rows]
+    buf.release()
+    return [r[:m] for r in xy], [r[m] for r in xy]
+
+def _train_job(shm_name: str, shape: tuple[int, ...], job: dict) -> dict:
+    """Fit one LogReg as described by job, on rows of the shared dataset."""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        job = dict(job)
+        train, test = job.pop("train", None), job.pop("test", None)
+        solver = job.pop("solver", "gd")
+        init = {k: job.pop(k) for k in list(job) if k in INIT_KWARGS}
+        init.setdefault("w", [0.0] * (shape[1] + 1))
+        init["w"] = list(init["w"])
+        job.pop("name", None)
+        lr = LogReg(**init)
+        x, y = _from_shm(shm, shape, train, lr.backend)
+        t1 = time.perf_counter()
+        getattr(lr, SOLVERS[solver])(x, y, **job)
+        res = {"w": [float(w_j) for w_j in lr.w], "cycles": lr.cycles,
+               "fit_time": time.perf_counter() - t1}
+        if test is not None:
+            x, y = _from_shm(shm, shape, test, lr.backend)
+            z = lr.calc_z(x)
+            losses = [lr.bce_logits(float(z_i), y_i) for z_i, y_i in zip(z, y)]
+            correct = [(z_i >= 0) == (y_i >= 0.5) for z_i, y_i in zip(z, y)]
+            res["test_loss"] = sum(losses) / len(losses)
+            res["test_accuracy"] = sum(correct) / len(correct)
+        return res
+    finally:
+        shm.close()
+
+def train_many(x, y, jobs: list[dict], max_workers: int | None=None) -> list[dict]:
+    """
+    Fit one LogReg per job concurrently in a process pool. The dataset is
+    copied once into shared memory, each worker reads only the rows it needs.
+    x may be dense (nested lists or an array) or CSR, which stays sparse.
+
+    Each job is a dict of LogReg() kwargs (w, learning_rate, threshold,
+    backend, fused), fit kwargs (e.g. max_cycles, batch_size), and optionally:
+    - train/test: row indices (default: all rows, no test)
+    - solver: "gd" (default), "newton", or "lbfgs"
+    - name: a label, passed through
+    Results (w, cycles, fit_time, test_loss, test_accuracy) are merged into a
+    copy of each job, in the same order. max_workers=1 runs in-process.
+    """
+    shm, shape = _to_shm(x, y)
+    try:
+        if max_workers == 1:
+            results = [_train_job(shm.name, shape, job) for job in jobs]
+        else:
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                futures = [executor.submit(_train_job, shm.name, shape, job) for job in jobs]
+                results = [future.result() for future in futures]
+    finally:
+        shm.close()
+        shm.unlink()
+    return [{**job, **res} for job, res in zip(jobs, results)]
+
+def cross_validate(x, y, k: int=5, grid: dict[str, list] | None=None, seed: int | None=42, max_workers: int | None=None, **kwargs) -> list[dict]:
+    """
+    k-fold cross-validation over a hyperparameter grid, e.g.
+    grid={"learning_rate": [0.1, 0.5], "threshold": [1e-3, 1e-5]}.
+    Other kwargs are shared by all jobs. All k x len(grid) fits run in one pool.
+    """
+    grid = grid or {}
+    folds = kfold_indices(len(y), k, seed=seed)
+    jobs, labels = [], []
+    for values in itertools.product(*grid.values()):
+        params = dict(zip(grid, values))
+        for i, (train, test) in enumerate(folds):
+            jobs.append({**kwargs, **params, "train": train, "test": test})
+            labels.append({**params, "fold": i})
+    results = train_many(x, y, jobs, max_workers)
+    return [{**label, **{k: v for k, v in res.items() if k not in {"train", "test"}}}
+            for label, res in zip(labels, results)]
+
 class TestLogReg(unittest.TestCase):
     def setUp(self):
         self.lr1 = LogReg([1, 2, 3])
@@ -405,6 +1100,330 @@ class TestLogReg(unittest.TestCase):
         self.assertEqual(self.lr1.w[2], -7.298782143528555)
         self.assertEqual(self.lr1.predict(x), [0.004777464629813595, 0.9966623231217798])
 
+    def test_iter_batches(self):
+        x = [[1], [2], [3], [4], [5]]
+        y = [0, 0, 1, 1, 1]
+        batches = list(LogReg.iter_batches(x, y, 2, shuffle=False))
+        self.assertEqual(batches, [([[1], [2]], [0, 0]), ([[3], [4]], [1, 1]), ([[5]], [1])])
+        batches = list(LogReg.iter_batches(x, y, 2, rng=random.Random(0)))
+        self.assertEqual(sorted(sum((b[0] for b in batches), [])), x)
+        with self.assertRaises(ValueError):
+            list(LogReg.iter_batches(x, y, 0))
+
+    def test_fit_minibatch_one_batch(self):
+        """A single batch per epoch is full-batch descent, plus one step."""
+        x = [[4, 5]]
+        y = [0]
+        lr2 = LogReg([1, 2, 3])
+        lr2.fit(x, y, learning_rate=0.5, threshold=0, max_cycles=3)
+        self.lr1.fit(x, y, learning_rate=0.5, max_cycles=10000, batch_size=1)
+        self.assertEqual((self.lr1.epochs, self.lr1.steps), (3, 3))
+        self.assertEqual(self.lr1.w, lr2.w)
+
+    def test_fit_minibatch(self):
+        x = [[0.4, 0.5], [0.6, 0.7], [0.1, 0.1], [0.8, 0.9], [0.2, 0.3]]
+        y = [0, 1, 0, 1, 0]
+        lr1 = LogReg([0, 0, 0])
+        lr1.fit(x, y, learning_rate=0.1, max_cycles=50, batch_size=2)
+        self.assertEqual((lr1.epochs, lr1.steps), (50, 150))
+        w = list(lr1.w)
+        lr2 = LogReg([0, 0, 0])
+        lr2.fit(x, y, learning_rate=0.1, max_cycles=50, batch_size=2)
+        self.assertEqual(lr2.w, w)  # Seeded, so reproducible.
+        lr3 = LogReg([0, 0, 0])
+        rng = random.Random(42)
+        lr3.fit_batches(lambda: LogReg.iter_batches(x, y, 2, rng=rng), learning_rate=0.1, max_epochs=50)
+        self.assertEqual(lr3.w, w)
+
+    def test_fit_batches_iterator(self):
+        """A plain iterator is consumed once."""
+        x = [[4, 5], [6, 7]]
+        y = [0, 1]
+        self.lr1.fit_batches(iter([([x_i], [y_i]) for x_i, y_i in zip(x, y)]), max_epochs=10)
+        self.assertEqual((self.lr1.epochs, self.lr1.steps), (1, 2))
+
+    def test_fused_kernels(self):
+        """Fused kernels stay finite (and accurate) where bce/sigmoid don't."""
+        self.assertEqual(LogReg.softplus(0), math.log(2))
+        self.assertEqual(LogReg.softplus(1000), 1000)
+        self.assertEqual(LogReg.log_sigmoid(-1000), -1000)
+        self.assertEqual(LogReg.sigmoid_stable(-1000), 0)
+        with self.assertRaises(OverflowError):
+            LogReg.sigmoid(-1000)
+        for x in (-math.log(7), 0, math.log(3), 24):
+            self.assertAlmostEqual(LogReg.sigmoid_stable(x), LogReg.sigmoid(x))
+        self.assertAlmostEqual(LogReg.bce_logits(24, 0), 24.000000000037748)
+        self.assertAlmostEqual(LogReg.bce_logits(0, 1), math.log(2))
+        self.assertEqual(LogReg.bce_logits(1000, 0), 1000)
+        self.assertEqual(LogReg.bce_logits(-1000, 0), 0)
+        self.assertEqual(LogReg.bce_logits_grad(0, 1), -0.5)
+        self.assertEqual(LogReg.bce_logits_grad(1000, 0), 1)
+
+    def test_fused_grads(self):
+        """Same gradients as test_calc_grads, without the 2.6e10 dL/dg."""
+        lr = LogReg([1, 2, 3], fused=True)
+        x = [[4, 5]]
+        lr.predict(x)
+        lr.calc_grads(x, [0])
+        for got, want in zip(lr.grads[0], [0.9999999999622485, 3.999999999848994, 4.9999999998112425]):
+            self.assertAlmostEqual(got, want)
+        self.assertAlmostEqual(lr.calc_loss([0])[0], 24.000000000037748)
+
+    def test_fused_fit(self):
+        x = [[4, 5], [6, 7]]
+        lr = LogReg([1, 2, 3], fused=True)
+        lr.fit(x, [0, 0], max_cycles=10000)
+        self.assertAlmostEqual(lr.cycles, 9447, delta=5)
+        lr = LogReg([1, 2, 3], fused=True)
+        lr.fit(x, [0, 1], learning_rate=5, max_cycles=10)  # Too large for bce_grad
+        self.assertTrue(all(math.isfinite(w_j) for w_j in lr.w))
+
+    def test_solve(self):
+        self.assertEqual(LogReg.solve([[2, 0], [0, 4]], [2, 2]), [1, 0.5])
+        got = LogReg.solve([[0, 1, 1], [2, 1, 0], [1, 0, 3]], [4, 4, 7])
+        for got_i, want_i in zip(got, [1, 2, 2]):
+            self.assertAlmostEqual(got_i, want_i)
+        with self.assertRaises(ZeroDivisionError):
+            LogReg.solve([[1, 2], [2, 4]], [1, 2])
+
+    def test_fit_newton_separable(self):
+        """test_fit_3 data: gradient descent needs > 10,000 cycles."""
+        x = [[4, 5], [6, 7]]
+        y = [0, 1]
+        self.lr1.fit_newton(x, y)
+        self.assertLess(self.lr1.iterations, 50)
+        self.assertLess(sum(self.lr1.calc_loss(y, self.lr1.predict(x))), self.lr1.threshold)
+
+    def test_fit_second_order(self):
+        """Non-separable data: Newton and L-BFGS reach the same optimum."""
+        x = [[0.0, 1.0], [1.0, 0.0], [2.0, 2.0], [3.0, 1.0], [4.0, 3.0], [5.0, 0.0], [2.5, 2.5]]
+        y = [0, 0, 1, 0, 1, 1, 0]
+        lr_n = LogReg([0, 0, 0])
+        lr_n.fit_newton(x, y)
+        lr_l = LogReg([0, 0, 0])
+        lr_l.fit_lbfgs(x, y)
+        self.assertLess(lr_n.iterations, 20)
+        self.assertLess(lr_l.iterations, 100)
+        self.assertLess(lr_n.grad_norm, 1e-8)
+        self.assertLess(lr_l.grad_norm, 1e-8)
+        self.assertGreaterEqual(lr_n.fit_time, 0)
+        for w_n, w_l in zip(lr_n.w, lr_l.w):
+            self.assertAlmostEqual(w_n, w_l, places=6)
+
+    def test_csr(self):
+        x = [[0, 2, 0], [0, 0, 0], [1, 0, 3]]
+        csr = CSR.from_dense(x)
+        self.assertEqual((csr.indptr, csr.indices, csr.data), ([0, 1, 1, 3], [1, 0, 2], [2, 1, 3]))
+        self.assertEqual(csr.shape, (3, 3))
+        self.assertEqual(csr.to_dense(), x)
+        self.assertEqual(csr.take([2, 0]).to_dense(), [x[2], x[0]])
+        self.assertEqual(csr.matvec([1, 2, 3]), [4, 0, 10])
+        self.assertEqual(csr.rmatvec([1, 2, 3]), [3, 2, 9])
+
+    def test_sparse_fit(self):
+        """Sparse input reproduces dense input."""
+        x = [[0, 1, 0, 0], [1, 0, 0, 1], [0, 0, 1, 0], [0, 1, 0, 1], [1, 0, 0, 0], [0, 0, 1, 1]]
+        y = [0, 1, 0, 1, 1, 0]
+        csr = CSR.from_dense(x)
+        lr_d = LogReg([0.1] * 5)
+        lr_s = LogReg([0.1] * 5)
+        for got, want in zip(lr_s.predict(csr), lr_d.predict(x)):
+            self.assertAlmostEqual(got, want)
+        lr_d.fit(x, y, max_cycles=200)
+        lr_s.fit(csr, y, max_cycles=200)
+        for got, want in zip(lr_s.w, lr_d.w):
+            self.assertAlmostEqual(got, want)
+        lr_d.fit(x, y, max_cycles=5, batch_size=2)
+        lr_s.fit(csr, y, max_cycles=5, batch_size=2)
+        for got, want in zip(lr_s.w, lr_d.w):
+            self.assertAlmostEqual(got, want)
+        lr_d, lr_s = LogReg([0.0] * 5), LogReg([0.0] * 5)
+        lr_d.fit_newton(x, y, ridge=1e-6)
+        lr_s.fit_newton(csr, y, ridge=1e-6)
+        for got, want in zip(lr_s.w, lr_d.w):
+            self.assertAlmostEqual(got, want, places=5)
+
+    def test_encode_redcap(self):
+        self.assertEqual(parse_redcap_opts("1, a | 2, b | NA, c, lol"), {"1": "a", "2": "b", "NA": "c, lol"})
+        records = [
+            {"age": 30, "sex": 1, "race": [1, 3]},
+            {"age": "", "sex": "2", "race": []},
+            {"age": 0, "sex": None, "race": ["2"]},
+            {"age": 41, "sex": 1.0, "race": 9},
+        ]
+        fields = {"sex": "1, Male | 2, Female", "race": "1, A | 2, B | 3, C"}
+        csr, colnames = encode_redcap(records, fields, numeric=["age"])
+        self.assertEqual(colnames, ["age", "sex___1", "sex___2", "race___1", "race___2", "race___3"])
+        self.assertEqual(csr.to_dense(), [
+            [30, 1, 0, 1, 0, 1],
+            [0, 0, 1, 0, 0, 0],
+            [0, 0, 0, 0, 1, 0],
+            [41, 1, 0, 0, 0, 0],
+        ])
+
+    def test_kfold_indices(self):
+        folds = kfold_indices(10, 3)
+        self.assertEqual(len(folds), 3)
+        self.assertEqual(sorted(sum((test for _, test in folds), [])), list(range(10)))
+        for train, test in folds:
+            self.assertEqual(sorted(train + test), list(range(10)))
+        with self.assertRaises(ValueError):
+            kfold_indices(10, 1)
+
+    def test_train_many(self):
+        x = [[0.0, 1.0], [1.0, 0.0], [2.0, 2.0], [3.0, 1.0], [4.0, 3.0], [5.0, 0.0], [2.5, 2.5]]
+        y = [0, 0, 1, 0, 1, 1, 0]
+        jobs = [{"name": "gd", "learning_rate": 0.1, "max_cycles": 100},
+                {"name": "newton", "solver": "newton", "train": [0, 1, 2, 3, 4, 5], "test": [6]}]
+        res = train_many(x, y, jobs, max_workers=2)
+        self.assertEqual([r["name"] for r in res], ["gd", "newton"])
+        lr = LogReg([0.0, 0.0, 0.0], learning_rate=0.1)
+        lr.fit(x, y, max_cycles=100)
+        self.assertEqual(res[0]["w"], lr.w)
+        self.assertEqual(res[0]["cycles"], 100)
+        self.assertIn("test_accuracy", res[1])
+        serial = train_many(x, y, jobs, max_workers=1)
+        self.assertEqual([r["w"] for r in serial], [r["w"] for r in res])
+        sparse = train_many(CSR.from_dense(x), y, jobs, max_workers=2)
+        for got, want in zip(sparse, res):
+            for w_s, w_d in zip(got["w"], want["w"]):
+                self.assertAlmostEqual(w_s, w_d)
+        self.assertAlmostEqual(sparse[1]["test_loss"], res[1]["test_loss"])
+
+    def test_cross_validate(self):
+        x = [[i / 10] for i in range(20)]
+        y = [int(i >= 8) ^ int(i in (3, 15)) for i in range(20)]
+        grid = {"learning_rate": [0.5, 1.0], "threshold": [1e-3]}
+        res = cross_validate(x, y, k=4, grid=grid, max_cycles=200, max_workers=2)
+        self.assertEqual(len(res), 2 * 4)
+        self.assertEqual([(r["learning_rate"], r["fold"]) for r in res[:5]],
+                         [(0.5, 0), (0.5, 1), (0.5, 2), (0.5, 3), (1.0, 0)])
+        self.assertTrue(all(0 <= r["test_accuracy"] <= 1 for r in res))
+
+@unittest.skipIf(np is None, "numpy not installed")
+class TestLogRegNumpy(unittest.TestCase):
+    """The numpy backend should reproduce the python backend."""
+    def setUp(self):
+        self.lr1 = LogReg([1, 2, 3], backend="numpy")
+
+    def assertAllClose(self, got, want, places=7):
+        self.assertEqual(len(got), len(want))
+        for got_i, want_i in zip(got, want):
+            self.assertAlmostEqual(got_i, want_i, places=places)
+
+    def test_invalid_backend(self):
+        with self.assertRaises(ValueError):
+            LogReg([1, 2, 3], backend="fortran")
+
+    def test_calc_z(self):
+        self.assertAllClose(self.lr1.calc_z([[4, 5], [6, 7]]), [24, 34])
+
+    def test_calc_grads(self):
+        x = [[4, 5]]
+        self.lr1.predict(x)
+        self.lr1.calc_grads(x, [0])
+        self.assertAllClose(self.lr1.grads[0], [0.9999999999622485, 3.999999999848994, 4.9999999998112425])
+
+    def test_after_1_round(self):
+        x = [[4, 5]]
+        self.lr1.predict(x)
+        self.lr1.calc_grads(x, [0])
+        self.lr1.update_w(learning_rate=0.5)
+        self.assertAllClose(self.lr1.w, [0.5000000000188758, 7.550293723568302e-11, 0.5000000000943787])
+        self.assertAllClose(self.lr1.predict(x), [0.9525741268582485])
+
+    def test_fit_1(self):
+        self.lr1.fit([[4, 5]], [0], learning_rate=0.5, max_cycles=10000)
+        self.assertEqual(self.lr1.cycles, 2)
+        self.assertAllClose(self.lr1.w, [0.023712936589751543, -1.905148253640994, -1.8814353170512423])
+
+    def test_fit_2(self):
+        x = [[4, 5], [6, 7]]
+        self.lr1.fit(x, [0, 0], max_cycles=10000)
+        self.assertAlmostEqual(self.lr1.cycles, 9447, delta=1)
+        self.assertAllClose(self.lr1.w, [0.27170766819206177, -1.460914619181487, -1.1892069509894383], places=4)
+
+    def test_fit_minibatch(self):
+        x = [[0.4, 0.5], [0.6, 0.7], [0.1, 0.1], [0.8, 0.9], [0.2, 0.3]]
+        y = [0, 1, 0, 1, 0]
+        lr1 = LogReg([0, 0, 0], backend="numpy")
+        lr1.fit(np.array(x), np.array(y), learning_rate=0.1, max_cycles=50, batch_size=2)
+        lr2 = LogReg([0, 0, 0])
+        lr2.fit(x, y, learning_rate=0.1, max_cycles=50, batch_size=2)
+        self.assertEqual(lr1.steps, 150)
+        self.assertAllClose(lr1.w, lr2.w)
+
+    def test_fit_second_order(self):
+        x = [[0.0, 1.0], [1.0, 0.0], [2.0, 2.0], [3.0, 1.0], [4.0, 3.0], [5.0, 0.0], [2.5, 2.5]]
+        y = [0, 0, 1, 0, 1, 1, 0]
+        lr_py = LogReg([0, 0, 0])
+        lr_py.fit_newton(x, y)
+        for fit in ("fit_newton", "fit_lbfgs"):
+            lr_np = LogReg([0, 0, 0], backend="numpy")
+            getattr(lr_np, fit)(np.array(x), np.array(y))
+            self.assertAllClose(lr_np.w, lr_py.w, places=6)
+
+    def test_fused_kernels(self):
+        z = np.array([-1000, -24, -math.log(3), 0, math.log(3), 24, 1000])
+        y = np.array([0, 1, 0, 1, 0, 1, 0])
+        for name in ("sigmoid_stable", "softplus", "log_sigmoid"):
+            vec = getattr(LogReg, name.replace("_stable", "") + "_np")(z)
+            self.assertAllClose(vec, [getattr(LogReg, name)(z_i) for z_i in z])
+        for name in ("bce_logits", "bce_logits_grad"):
+            vec = getattr(LogReg, name + "_np")(z, y)
+            self.assertAllClose(vec, [getattr(LogReg, name)(z_i, y_i) for z_i, y_i in zip(z, y)])
+
+    def test_fused_fit(self):
+        x = [[4, 5], [6, 7]]
+        lr_py = LogReg([1, 2, 3], fused=True)
+        lr_py.fit(x, [0, 0], max_cycles=10000)
+        lr_np = LogReg([1, 2, 3], backend="numpy", fused=True)
+        lr_np.fit(x, [0, 0], max_cycles=10000)
+        self.assertAlmostEqual(lr_np.cycles, lr_py.cycles, delta=1)
+        self.assertAllClose(lr_np.w, lr_py.w, places=4)
+
+    def test_sparse_fit(self):
+        x = [[0, 1, 0, 0], [1, 0, 0, 1], [0, 0, 1, 0], [0, 1, 0, 1], [1, 0, 0, 0], [0, 0, 1, 1]]
+        y = [0, 1, 0, 1, 1, 0]
+        csr = CSR.from_dense(x)
+        lr_d = LogReg([0.1] * 5, backend="numpy")
+        lr_d.fit(x, y, max_cycles=200)
+        for fused in (False, True):
+            lr_s = LogReg([0.1] * 5, backend="numpy", fused=fused)
+            lr_s.fit(csr, y, max_cycles=200)
+            self.assertAllClose(lr_s.w, lr_d.w)
+            self.assertAllClose(lr_s.predict(csr), lr_d.predict(x))
+        lr_s = LogReg([0.1] * 5, backend="numpy")
+        lr_s.calc_grads(csr, y, lr_s.predict(csr))
+        lr_d = LogReg([0.1] * 5, backend="numpy")
+        lr_d.calc_grads(x, y, lr_d.predict(x))
+        self.assertAllClose(lr_s.grads[0], lr_d.grads.mean(axis=0))
+        w = [0.1, -0.2, 0.3, 0.4, -0.5]
+        _, _, hess_s = lr_s.mean_loss_grad(csr, y, w, hessian=True)
+        _, _, hess_d = lr_d.mean_loss_grad(x, y, w, hessian=True)
+        self.assertAllClose(hess_s.ravel(), hess_d.ravel())
+        lr_d, lr_s = LogReg([0.0] * 5, backend="numpy"), LogReg([0.0] * 5, backend="numpy")
+        lr_d.fit_newton(x, y, ridge=1e-6)
+        lr_s.fit_newton(csr, y, ridge=1e-6)
+        self.assertAllClose(lr_s.w, lr_d.w, places=5)
+
+    def test_train_many(self):
+        x = np.array([[0.0, 1.0], [1.0, 0.0], [2.0, 2.0], [3.0, 1.0], [4.0, 3.0], [5.0, 0.0], [2.5, 2.5]])
+        y = np.array([0, 0, 1, 0, 1, 1, 0])
+        jobs = [{"solver": "newton", "backend": backend, "train": [0, 1, 2, 3, 4, 5], "test": [6]}
+                for backend in BACKENDS]
+        res_py, res_np = train_many(x, y, jobs, max_workers=2)
+        self.assertAllClose(res_np["w"], res_py["w"])
+        self.assertAlmostEqual(res_np["test_loss"], res_py["test_loss"])
+        _, res_sparse = train_many(CSR.from_dense(x.tolist()), y, jobs, max_workers=2)
+        self.assertAllClose(res_sparse["w"], res_np["w"])
+
+    def test_fit_3(self):
+        x = [[4, 5], [6, 7]]
+        self.lr1.fit(x, [0, 1], max_cycles=10000)
+        self.assertEqual(self.lr1.cycles, 10000)
+        self.assertAllClose(self.lr1.w, [-20.11666097319304, 12.817878829664442, -7.298782143528555], places=2)
+
 
 
 def main() -> None:
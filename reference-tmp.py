@@ -1,12 +1,26 @@
+from __future__ import annotations
+
 import doctest
+import hashlib
+import json
+import multiprocessing
 import os
-import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from typing import Callable
 
 import numpy as np
 import polars as pl
-import pyreadstat
-import xlsxwriter
+
+# pyreadstat and xlsxwriter (and pyarrow) are imported where they are used,
+# so importing this module doesn't load them.
+
+# Hot deck imputation has one implementation, in src/impute_hd.py.
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "src")
+if SRC_DIR not in sys.path:
+    sys.path.append(SRC_DIR)
+from impute_hd import CHUNK_CELLS, WEIGHTS, donor_values, impute_hd, prepare_donors, sq_dists
 
 def dct_to_redcap_opts(dct: dict[(int | float | str), str]) -> str:
     """
@@ -31,9 +45,47 @@ def meta_to_dd(meta: pyreadstat.metadata_container) -> pl.DataFrame:
         dd = dd.join(dd2, on=V, how="outer_coalesce")
     return dd
 
-def safe_to_int(x: pl.Series | pl.DataFrame) -> pl.Series | pl.DataFrame:
+INT_DTYPES_BY_SIZE = {pl.Int8: 8, pl.Int16: 16, pl.Int32: 32, pl.Int64: 64}
+
+def cast_stat_exprs(schema: dict[str, pl.DataType], narrow: bool=False) -> list[pl.Expr]:
     """
-    Convert to int dtype if possible without loss of data.
+    Aggregations (one row, all columns at once) deciding which numeric columns
+    can be cast to int, or narrowed, without loss of data.
+    """
+    exprs = []
+    for k, dtype in schema.items():
+        if dtype not in pl.NUMERIC_DTYPES:
+            continue
+        c = pl.col(k)
+        i = c.cast(pl.Int64, strict=False)
+        exprs.append(((i == c).all() & (i.is_null() == c.is_null()).all()).alias(f"{k}\0int"))
+        if narrow:
+            exprs += [i.min().alias(f"{k}\0min"), i.max().alias(f"{k}\0max")]
+            if dtype == pl.Float64:
+                f = c.cast(pl.Float32).cast(pl.Float64)
+                exprs.append(((f == c).all() & c.is_finite().all()).alias(f"{k}\0f32"))
+    return exprs
+
+def casts_from_stats(stats: dict, narrow: bool=False) -> dict[str, pl.DataType]:
+    """Target dtype for each column that should be cast (see cast_stat_exprs)."""
+    casts = {}
+    for key, ok in stats.items():
+        k, stat = key.rsplit("\0", 1)
+        if stat == "int" and ok:
+            casts[k] = pl.Int64
+            if narrow:
+                lo, hi = stats[f"{k}\0min"] or 0, stats[f"{k}\0max"] or 0
+                casts[k] = next(dt for dt, bits in INT_DTYPES_BY_SIZE.items()
+                                if -2**(bits - 1) <= lo and hi < 2**(bits - 1))
+        elif stat == "f32" and ok and k not in casts:
+            casts[k] = pl.Float32
+    return casts
+
+def safe_to_int(x: pl.Series | pl.DataFrame, narrow: bool=False) -> pl.Series | pl.DataFrame:
+    """
+    Convert to int dtype if possible without loss of data. If narrow, use the
+    smallest int dtype that fits, and Float32 for floats that survive the
+    round trip. All columns are checked in a single select.
 
     >>> safe_to_int(pl.Series([1.0, 2.1])).dtype
     Float64
@@ -46,25 +98,202 @@ def safe_to_int(x: pl.Series | pl.DataFrame) -> pl.Series | pl.DataFrame:
 
     >>> safe_to_int(pl.DataFrame({'a': [None, None], 'b': [1.0, 2.0]})).dtypes
     [Null, Int64]
+
+    >>> safe_to_int(pl.DataFrame({'a(1)': [1.0, None], 'b|c': [2.0, 3.0]})).dtypes
+    [Int64, Int64]
+
+    >>> safe_to_int(pl.DataFrame({'a': [1.0, 300.0], 'b': [1.5, None],
+    ...                           'c': [0.1, 2.0], 'd': [-1, 2]}), narrow=True).dtypes
+    [Int16, Float32, Float64, Int8]
     """
-    is_ok = lambda s: s.dtype in pl.NUMERIC_DTYPES and s.cast(int).eq(s).all()
     if isinstance(x, pl.Series):
-        if is_ok(x):
-            x = x.cast(int)
-    elif isinstance(x, pl.DataFrame):
-        colnames = (s.name for s in x if is_ok(s))
-        pattern = f"^({'|'.join(colnames)})$"
-        x = x.with_columns(pl.col(pattern).cast(int))
-    return x
-
-def read_sav_to_dfdd(path: str) -> (pl.DataFrame, pl.DataFrame):
+        return safe_to_int(x.to_frame(), narrow).to_series()
+    exprs = cast_stat_exprs(x.schema, narrow)
+    if not exprs:
+        return x
+    casts = casts_from_stats(x.select(exprs).row(0, named=True), narrow)
+    return x.with_columns(pl.col(k).cast(dtype) for k, dtype in casts.items())
+
+def read_sav_to_dfdd(path: str, narrow: bool=False) -> (pl.DataFrame, pl.DataFrame):
+    import pyreadstat
     df, meta = pyreadstat.read_sav(path)
-    df = pl.DataFrame(df).pipe(safe_to_int)
+    df = pl.DataFrame(df).pipe(safe_to_int, narrow)
     dd = meta_to_dd(meta)
     return df, dd
 
-def drop_empty_cols(df: pl.DataFrame) -> pl.DataFrame:
+def _write_atomic(path: str, text: str) -> None:
+    with open(f"{path}.tmp", "w") as f:
+        f.write(text)
+    os.replace(f"{path}.tmp", path)
+
+def _md5_file(path: str) -> str:
+    """MD5 of a file's contents, as util.hashsum (hashlib.file_digest needs 3.11)."""
+    with open(path, "rb") as f:
+        if hasattr(hashlib, "file_digest"):
+            return hashlib.file_digest(f, "md5").hexdigest()
+        h = hashlib.md5()
+        while (chunk := f.read(1 << 20)):
+            h.update(chunk)
+        return h.hexdigest()
+
+def read_sav_dd(path: str, cache_dir: str | None=None) -> pl.DataFrame:
     """
+    Read only the metadata of a SAV file (not the data) and convert it to a
+    data dictionary. If cache_dir is given, data dictionaries are cached there
+    as JSON, keyed by the MD5 of the file contents. As in util.BuildCache,
+    the file is only hashed when its (size, mtime_ns) changes, which is kept
+    with the digest in one stat file per realpath, overwritten on change.
+
+    >>> import tempfile, pandas as pd, pyreadstat
+    >>> tmp = tempfile.mkdtemp()
+    >>> path, cache_dir = os.path.join(tmp, "t.sav"), os.path.join(tmp, "cache")
+    >>> pyreadstat.write_sav(pd.DataFrame({"a": [1.0, 2.0]}), path, column_labels=["A"],
+    ...                      variable_value_labels={"a": {1: "one"}})
+    >>> read_sav_dd(path, cache_dir).rows()
+    [('a', 'A', '1, one')]
+    >>> read_sav_dd(path, cache_dir).equals(read_sav_dd(path))
+    True
+    >>> pyreadstat.write_sav(pd.DataFrame({"a": [1.0, 2.0]}), path, column_labels=["B"])
+    >>> read_sav_dd(path, cache_dir).rows()
+    [('a', 'B')]
+    >>> names = os.listdir(cache_dir)
+    >>> len([name for name in names if name.startswith("stat-")]), len(names)
+    (1, 3)
+    """
+    if cache_dir is None:
+        import pyreadstat
+        _, meta = pyreadstat.read_sav(path, metadataonly=True)
+        return meta_to_dd(meta)
+    os.makedirs(cache_dir, exist_ok=True)
+    real_path = os.path.realpath(path)
+    st = os.stat(real_path)
+    stat_path = os.path.join(cache_dir, f"stat-{hashlib.md5(real_path.encode()).hexdigest()}.json")
+    stat = {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+    cached = {}
+    if os.path.exists(stat_path):
+        with open(stat_path) as f:
+            cached = json.load(f)
+    if {k: cached.get(k) for k in stat} == stat:
+        digest = cached["digest"]
+    else:
+        digest = _md5_file(real_path)
+        _write_atomic(stat_path, json.dumps({**stat, "digest": digest}))
+
+    cache_path = os.path.join(cache_dir, f"{digest}.json")
+    if os.path.exists(cache_path):
+        with open(cache_path) as f:
+            return pl.DataFrame(json.load(f))
+    dd = read_sav_dd(real_path)
+    _write_atomic(cache_path, json.dumps(dd.to_dict(as_series=False)))
+    return dd
+
+def catalog_savs(src_dir: str, cache_dir: str | None=None) -> pl.DataFrame:
+    """
+    Data dictionaries of every SAV file in src_dir, stacked, with a File column.
+    """
+    paths = sorted(de.path for de in os.scandir(src_dir) if de.name.endswith(".sav"))
+    dds = [read_sav_dd(path, cache_dir).select(pl.lit(os.path.basename(path)).alias("File"), pl.all())
+           for path in paths]
+    return pl.concat(dds, how="diagonal_relaxed") if dds else pl.DataFrame(schema={"File": pl.Utf8, "Variable": pl.Utf8})
+
+DROPS = ("empty_cols", "uniform_cols", "empty_rows")
+
+def read_sav_lazy(path: str,
+                  usecols: list[str] | None=None,
+                  drop: tuple[str, ...]=(),
+                  narrow: bool=False) -> (pl.DataFrame, pl.DataFrame):
+    """
+    Like read_sav_to_dfdd, but without pandas: only usecols are read from the
+    SAV (straight into polars), and the int conversion plus any of the DROPS
+    are fused into one lazy plan. One pass over the data gathers the column
+    statistics, and a second pass selects, casts and filters.
+    Empty numeric columns come out as Null dtype (instead of Float64).
+
+    Same result as the eager path (read_sav_to_dfdd, then the drop_* functions):
+
+    >>> import tempfile, pandas as pd, pyreadstat
+    >>> path = os.path.join(tempfile.mkdtemp(), "t.sav")
+    >>> pdf = pd.DataFrame({"u": [1.0, 1.0, np.nan, np.nan], "c": [2.0, 2.0, 2.0, np.nan],
+    ...                     "e": [np.nan] * 4, "v": [1.5, 2.0, 3.0, np.nan]})
+    >>> pyreadstat.write_sav(pdf, path)
+    >>> lazy, _ = read_sav_lazy(path, drop=DROPS)
+    >>> eager, _ = read_sav_to_dfdd(path)
+    >>> eager = drop_empty_rows(drop_uniform_cols(drop_empty_cols(eager)))
+    >>> lazy.columns, lazy.equals(eager)
+    (['u', 'c', 'v'], True)
+    """
+    if (bad := set(drop) - set(DROPS)):
+        raise ValueError(f"Invalid drop: {bad}, expected any of {DROPS}")
+    import pyreadstat
+    data, meta = pyreadstat.read_sav(path, usecols=usecols, output_format="polars")
+    lf = data.lazy()
+    schema = lf.schema
+
+    # Column statistics, all columns in one select.
+    exprs = cast_stat_exprs(schema, narrow)
+    if "empty_cols" in drop:
+        exprs += [pl.col(k).is_not_null().any().alias(f"{k}\0nonempty") for k in schema]
+    if "uniform_cols" in drop:
+        exprs += [varied_expr(k) for k in schema]
+    stats = lf.select(exprs).collect().row(0, named=True) if exprs else {}
+    casts = casts_from_stats(stats, narrow)
+
+    keep = [k for k in schema
+            if stats.get(f"{k}\0nonempty", True) and stats.get(f"{k}\0varied", True)]
+    plan = lf.select(pl.col(k).cast(casts[k]) if k in casts else pl.col(k) for k in keep)
+    if "empty_rows" in drop and keep:
+        plan = plan.filter(~pl.all_horizontal(pl.all().is_null()))
+    return plan.collect(), meta_to_dd(meta)
+
+def varied_expr(k: str) -> pl.Expr:
+    """
+    Whether column k has two or more distinct values: any value differs from
+    the first (null counts as a value), which needs no hashing, unlike
+    n_unique. Shared by profile_cols and read_sav_lazy.
+    """
+    col = pl.col(k)
+    return col.ne_missing(col.first()).any().alias(f"{k}\0varied")
+
+def profile_exprs(schema: dict[str, pl.DataType]) -> list[pl.Expr]:
+    """Column statistics for profile_cols, see varied_expr."""
+    exprs = []
+    for k, dtype in schema.items():
+        col = pl.col(k)
+        exprs += [col.null_count().alias(f"{k}\0null_count"),
+                  varied_expr(k)]
+        if dtype.is_numeric() or dtype.is_temporal() or dtype in {pl.Boolean, pl.Utf8}:
+            exprs += [col.min().cast(pl.Utf8).alias(f"{k}\0min"),
+                      col.max().cast(pl.Utf8).alias(f"{k}\0max")]
+    return exprs
+
+def profile_cols(df: pl.DataFrame) -> pl.DataFrame:
+    """
+    One row per column of df: dtype, null count, min and max (as strings,
+    where the dtype is ordered), and whether it has two or more distinct
+    values. All columns are profiled in one select.
+
+    >>> df = pl.DataFrame({'a': [1, 3], 'b': [None, None], 'c': ['x', None]})
+    >>> profile_cols(df).rows()
+    [('a', 'Int64', 0, '1', '3', True), ('b', 'Null', 2, None, None, False), ('c', 'String', 1, 'x', 'x', True)]
+    """
+    assert isinstance(df, pl.DataFrame)
+    stats = df.select(profile_exprs(df.schema)).row(0, named=True) if df.width else {}
+    return pl.DataFrame({
+        "column": df.columns,
+        "dtype": [str(dtype) for dtype in df.dtypes],
+        "null_count": [stats[f"{k}\0null_count"] for k in df.columns],
+        "min": [stats.get(f"{k}\0min") for k in df.columns],
+        "max": [stats.get(f"{k}\0max") for k in df.columns],
+        "varied": [stats[f"{k}\0varied"] for k in df.columns],
+    }, schema={"column": pl.Utf8, "dtype": pl.Utf8, "null_count": pl.Int64,
+               "min": pl.Utf8, "max": pl.Utf8, "varied": pl.Boolean})
+
+def drop_empty_cols(df: pl.DataFrame, profile: pl.DataFrame | None=None) -> pl.DataFrame:
+    """
+    Remove columns where all values are null. profile (from profile_cols) is
+    computed if not given.
+
     >>> drop_empty_cols(pl.DataFrame({'a': [1], 'b': [2]})).columns
     ['a', 'b']
     
@@ -72,11 +301,14 @@ def drop_empty_cols(df: pl.DataFrame) -> pl.DataFrame:
     ['a']
     """
     assert isinstance(df, pl.DataFrame)
-    return df[[s.name for s in df if s.null_count() < df.height]]
+    if profile is None:
+        profile = profile_cols(df)
+    return df.select(profile.filter(pl.col("null_count") < df.height)["column"].to_list())
 
-def drop_uniform_cols(df: pl.DataFrame) -> pl.DataFrame:
+def drop_uniform_cols(df: pl.DataFrame, profile: pl.DataFrame | None=None) -> pl.DataFrame:
     """
-    Remove columns where all values are the same.
+    Remove columns where all values are the same. profile (from profile_cols)
+    is computed if not given.
     
     >>> drop_uniform_cols(pl.DataFrame({'a': [1, 2], 'b': [3, 4]})).columns
     ['a', 'b']
@@ -88,7 +320,9 @@ def drop_uniform_cols(df: pl.DataFrame) -> pl.DataFrame:
     ['b']
     """
     assert isinstance(df, pl.DataFrame)
-    return df[[s.name for s in df if s.dtype != pl.Null and s.n_unique() > 1]]
+    if profile is None:
+        profile = profile_cols(df)
+    return df.select(profile.filter(pl.col("varied"))["column"].to_list())
 
 def drop_empty_rows(df: pl.DataFrame, expr: pl.Expr=pl.all()) -> pl.DataFrame:
     """
@@ -101,9 +335,109 @@ def drop_empty_rows(df: pl.DataFrame, expr: pl.Expr=pl.all()) -> pl.DataFrame:
     assert isinstance(df, pl.DataFrame)
     return df.filter(~pl.all_horizontal(expr.is_null()))
 
-def write_excel_wb(dfs: dict[str, pl.DataFrame], path: str) -> None:
+EXCEL_MAX_ROWS = 1_048_576
+
+def split_for_excel(name: str, df: pl.DataFrame, max_rows: int=EXCEL_MAX_ROWS - 1) -> list[tuple[str, pl.DataFrame]]:
+    """
+    Split into zero-copy slices of at most max_rows (excluding the header),
+    named name, name_2, name_3, ...
+
+    >>> [(k, v.height) for k, v in split_for_excel('Data', pl.DataFrame({'a': range(5)}), 2)]
+    [('Data', 2), ('Data_2', 2), ('Data_3', 1)]
+
+    >>> [(k, v.height) for k, v in split_for_excel('Data', pl.DataFrame({'a': []}))]
+    [('Data', 0)]
+    """
+    offsets = range(0, max(df.height, 1), max_rows)
+    return [(name if i == 0 else f"{name[:31 - len(str(i + 1)) - 1]}_{i + 1}", df.slice(offset, max_rows))
+            for i, offset in enumerate(offsets)]
+
+# Number formats by dtype: polars' write_excel defaults, except integers.
+EXCEL_INT_FORMAT = "#0"
+EXCEL_NUM_FORMATS = {
+    pl.Float32: "#,##0.000;[Red]-#,##0.000",
+    pl.Float64: "#,##0.000;[Red]-#,##0.000",
+    pl.Datetime: "yyyy-mm-dd hh:mm:ss",
+    pl.Date: "yyyy-mm-dd;@",
+    pl.Time: "hh:mm:ss;@",
+}
+
+def excel_num_format(dtype: pl.DataType) -> str | None:
+    """
+    The number format of a column of dtype in write_excel_wb, either way.
+
+    >>> excel_num_format(pl.Int8), excel_num_format(pl.Datetime("ms")), excel_num_format(pl.Utf8)
+    ('#0', 'yyyy-mm-dd hh:mm:ss', None)
+    """
+    if dtype.is_integer():
+        return EXCEL_INT_FORMAT
+    return EXCEL_NUM_FORMATS.get(dtype.base_type())
+
+def write_sheet_rows(wb: xlsxwriter.Workbook,
+                     name: str,
+                     df: pl.DataFrame,
+                     column_widths: dict[str, int] | None=None,
+                     chunk_size: int=10_000) -> None:
+    """
+    Write df row by row (as required by constant_memory mode), with the same
+    number formats (see excel_num_format) and column widths (pixels) as
+    write_excel_wb. The formats are set on the cells, since Excel only
+    applies column formats to empty cells.
+    """
+    ws = wb.add_worksheet(name)
+    header_fmt = wb.add_format({"bold": True})
+    formats = {}
+    for dtype in df.dtypes:
+        if (num_format := excel_num_format(dtype)) and num_format not in formats:
+            formats[num_format] = wb.add_format({"num_format": num_format})
+    col_fmts = [formats.get(excel_num_format(dtype)) for dtype in df.dtypes]
+    column_widths = column_widths or {}
+    for j, (k, fmt) in enumerate(zip(df.columns, col_fmts)):
+        if k in column_widths:
+            ws.set_column_pixels(j, j, column_widths[k], fmt)
+        elif fmt is not None:
+            ws.set_column(j, j, None, fmt)
+    ws.write_row(0, 0, df.columns, header_fmt)
+    # One write_row per run of adjacent columns with the same format.
+    runs = []
+    for j, fmt in enumerate(col_fmts):
+        if runs and runs[-1][2] is fmt:
+            runs[-1][1] = j + 1
+        else:
+            runs.append([j, j + 1, fmt])
+    i = 1
+    for chunk in df.iter_slices(chunk_size):
+        for row in chunk.iter_rows():
+            for start, stop, fmt in runs:
+                ws.write_row(i, start, row[start:stop], fmt)
+            i += 1
+
+def write_excel_wb(dfs: dict[str, pl.DataFrame],
+                   path: str,
+                   verbose: bool=True,
+                   constant_memory: bool=False,
+                   max_rows: int=EXCEL_MAX_ROWS - 1) -> None:
     """
     Write dataframe(s) into an Excel Workbook.
+    Data frames with more than max_rows rows are split across sheets.
+    If constant_memory, rows are streamed to disk as they are written, so
+    xlsxwriter's memory use stays flat regardless of the number of rows.
+    Either way, columns get the same number formats (see excel_num_format).
+
+    >>> import datetime as dt, tempfile, zipfile, xml.etree.ElementTree as ET
+    >>> df = pl.DataFrame({"i": [1, 2, 3], "x": [0.5, 1.5, None],
+    ...                    "t": [dt.datetime(2024, 1, 2, 3, 4, 5)] * 3, "d": [dt.date(2024, 1, 2)] * 3})
+    >>> def xlsx_info(constant_memory):
+    ...     path = os.path.join(tempfile.mkdtemp(), "t.xlsx")
+    ...     write_excel_wb({"Data": df}, path, False, constant_memory, max_rows=2)
+    ...     with zipfile.ZipFile(path) as z:
+    ...         styles, book = (ET.fromstring(z.read(f"xl/{k}.xml")) for k in ("styles", "workbook"))
+    ...     return (sorted({e.get("formatCode") for e in styles.iter() if e.tag.endswith("numFmt")}),
+    ...             [e.get("name") for e in book.iter() if e.tag.endswith("sheet")])
+    >>> xlsx_info(True)
+    (['#,##0.000;[Red]-#,##0.000', '#0', 'yyyy-mm-dd hh:mm:ss', 'yyyy-mm-dd;@'], ['Data', 'Data_2'])
+    >>> xlsx_info(True) == xlsx_info(False)
+    True
     """
     dd_col_widths = {
         "Variable": 100,
@@ -111,136 +445,224 @@ def write_excel_wb(dfs: dict[str, pl.DataFrame], path: str) -> None:
         "Options": 400,
         "Remarks": 100,
     }
-    with xlsxwriter.Workbook(path) as wb:
+    options = {}
+    if constant_memory:
+        options = {"constant_memory": True,
+                   "default_date_format": "yyyy-mm-dd",
+                   "nan_inf_to_errors": True}
+    import xlsxwriter
+    with xlsxwriter.Workbook(path, options) as wb:
         for k, df in dfs.items():
             cw = dd_col_widths if k.strip().lower() == "datadict" else None
-            df.write_excel(workbook=wb,
-                           worksheet=k,
-                           dtype_formats={pl.INTEGER_DTYPES: "#0"},
-                           column_widths=cw)
-    print(f"File written: {path}")
+            for name, part in split_for_excel(k, df, max_rows):
+                if constant_memory:
+                    write_sheet_rows(wb, name, part, cw)
+                else:
+                    part.write_excel(workbook=wb,
+                                     worksheet=name,
+                                     dtype_formats={pl.INTEGER_DTYPES: EXCEL_INT_FORMAT},
+                                     column_widths=cw)
+    verbose and print(f"File written: {path}")
+
+DD_METADATA_KEY = "datadict"
+COLUMNAR_EXTS = {"parquet": "parquet", "ipc": "arrow", "feather": "arrow"}
+FORMATS = ("xlsx", *COLUMNAR_EXTS)
+
+def write_columnar(df: pl.DataFrame, dd: pl.DataFrame, path: str, fmt: str="parquet", verbose: bool=True) -> None:
+    """
+    Write df as Parquet (zstd) or Arrow IPC/Feather (uncompressed, so readers
+    can memory-map it), with dd embedded as JSON in the file-level metadata.
+
+    >>> import tempfile
+    >>> df = pl.DataFrame({"a": [1, 2], "b": ["x", None]})
+    >>> dd = pl.DataFrame({"Variable": ["a", "b"], "Description": ["A", "B"]})
+    >>> tmp = tempfile.mkdtemp()
+    >>> for fmt, read in (("parquet", pl.read_parquet), ("ipc", pl.read_ipc)):
+    ...     path = os.path.join(tmp, f"t.{COLUMNAR_EXTS[fmt]}")
+    ...     write_columnar(df, dd, path, fmt, verbose=False)
+    ...     print(fmt, read(path).equals(df), read_columnar_dd(path).equals(dd))
+    parquet True True
+    ipc True True
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    table = df.to_arrow()
+    metadata = {**(table.schema.metadata or {}), DD_METADATA_KEY: json.dumps(dd.to_dicts())}
+    table = table.replace_schema_metadata(metadata)
+    if fmt == "parquet":
+        pq.write_table(table, path, compression="zstd")
+    elif fmt in {"ipc", "feather"}:
+        with pa.ipc.new_file(path, table.schema) as writer:
+            writer.write_table(table)
+    else:
+        raise ValueError(f"Invalid fmt: {fmt!r}, expected one of {tuple(COLUMNAR_EXTS)}")
+    verbose and print(f"File written: {path}")
+
+def read_columnar_dd(path: str) -> pl.DataFrame:
+    """Read the DataDict embedded by write_columnar, without reading the data."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    if path.endswith(".parquet"):
+        metadata = pq.read_schema(path).metadata
+    else:
+        with pa.memory_map(path) as source:
+            metadata = pa.ipc.open_file(source).schema.metadata
+    return pl.DataFrame(json.loads(metadata[DD_METADATA_KEY.encode()]))
 
 # -----------------------------------------------------------------------------
 
-def sav_to_xl(src_path: str, dest_dir: str, func: Callable | None=None) -> None:
+def check_fmt(fmt: str) -> None:
+    """Raise ValueError unless fmt is one of FORMATS, before any SAV is read."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Invalid fmt: {fmt!r}, expected one of {FORMATS}")
+
+def xl_dest_path(src_path: str, dest_dir: str, fmt: str="xlsx") -> str:
+    stem, ext = os.path.splitext(os.path.basename(src_path))
+    return f"{dest_dir}/{stem}.{COLUMNAR_EXTS.get(fmt, fmt)}"
+
+def sav_to_xl(src_path: str,
+              dest_dir: str,
+              func: Callable | None=None,
+              usecols: list[str] | None=None,
+              drop: tuple[str, ...] | None=None,
+              verbose: bool=True,
+              constant_memory: bool=False,
+              fmt: str="xlsx") -> dict:
     """
     Read a SAV file and write out the corresponding XLSX file.
     The original filename will be retained.
+    If usecols or drop is given, the SAV is read with read_sav_lazy.
+    fmt may also be "parquet" or "ipc"/"feather" (see write_columnar), which
+    are much faster to write and to reload than XLSX.
+    Returns a summary: rows, columns, bytes read and written.
+
+    >>> sav_to_xl("missing.sav", "out", fmt="csv")
+    Traceback (most recent call last):
+    ...
+    ValueError: Invalid fmt: 'csv', expected one of ('xlsx', 'parquet', 'ipc', 'feather')
     """
-    df, dd = read_sav_to_dfdd(src_path)
+    check_fmt(fmt)
+    if usecols is None and drop is None:
+        df, dd = read_sav_to_dfdd(src_path)
+    else:
+        df, dd = read_sav_lazy(src_path, usecols, drop or ())
     if func:
         df, dd = func(df, dd)
-    stem, ext = os.path.splitext(os.path.basename(src_path))
-    dest_path = f"{dest_dir}/{stem}.xlsx"
-    os.path.isdir(dest_dir) or os.makedirs(dest_dir)
-    write_excel_wb({"Data": df, "DataDict": dd}, dest_path)
+    dest_path = xl_dest_path(src_path, dest_dir, fmt)
+    os.makedirs(dest_dir, exist_ok=True)
+    if fmt == "xlsx":
+        write_excel_wb({"Data": df, "DataDict": dd}, dest_path, verbose, constant_memory)
+    else:
+        write_columnar(df, dd, dest_path, fmt, verbose)
+    return {"rows": df.height, "cols": df.width,
+            "src_bytes": os.path.getsize(src_path),
+            "dest_bytes": os.path.getsize(dest_path)}
+
+def _sav_to_xl_isolated(src_path: str, *args, **kwargs) -> dict:
+    """sav_to_xl, timed, with any error captured instead of raised."""
+    t1 = time.perf_counter()
+    try:
+        res = {"status": "ok", **sav_to_xl(src_path, *args, verbose=False, **kwargs)}
+    except Exception as e:
+        res = {"status": "error", "error": f"{type(e).__name__}: {e}"}
+    res["secs"] = time.perf_counter() - t1
+    return res
 
-def savs_to_xls(src_dir: str, dest_dir: str, func: Callable | None=None) -> None:
-    for de in os.scandir(src_dir):
-        if de.name.endswith(".sav"):
-            sav_to_xl(de.path, dest_dir, func)
+def _future_result(future) -> dict:
+    """future.result(), or an error row if the pool failed (e.g. BrokenProcessPool, pickling)."""
+    try:
+        return future.result()
+    except Exception as e:
+        return {"status": "error", "error": f"{type(e).__name__}: {e}"}
+
+def savs_to_xls(src_dir: str,
+                dest_dir: str,
+                func: Callable | None=None,
+                cache=None,
+                max_workers: int | None=1,
+                usecols: list[str] | None=None,
+                drop: tuple[str, ...] | None=None,
+                fmt: str="xlsx",
+                verbose: bool=True) -> pl.DataFrame:
+    """
+    Convert every SAV file in src_dir, in a process pool if max_workers != 1
+    (None: one per CPU). func must then be picklable (a module-level function).
+    A file that fails is reported, and does not abort the batch.
+    If a cache (util.BuildCache) is given, files whose contents, func, and
+    output are unchanged are skipped.
+    If verbose, progress is printed in filename order, then a summary.
+    Returns one summary row per file.
+
+    >>> import tempfile, pandas as pd, pyreadstat
+    >>> src_dir, dest_dir = tempfile.mkdtemp(), tempfile.mkdtemp()
+    >>> pyreadstat.write_sav(pd.DataFrame({"a": [1.0]}), os.path.join(src_dir, "a.sav"))
+    >>> res = savs_to_xls(src_dir, dest_dir, func=lambda df, dd: (df, dd), max_workers=2, verbose=False)
+    >>> res["status"].to_list(), res["error"].str.contains("pickle").to_list()
+    (['error'], [True])
+    """
+    check_fmt(fmt)
+    paths = sorted(de.path for de in os.scandir(src_dir) if de.name.endswith(".sav"))
+    args = (dest_dir, func)
+    kwargs = {"usecols": usecols, "drop": drop, "fmt": fmt}
+    os.makedirs(dest_dir, exist_ok=True)
+
+    todo, cached = [], set()
+    if cache is not None:
+        transform = cache.transform_id(sav_to_xl, *args, **kwargs)
+    for path in paths:
+        if cache is not None and os.path.exists(xl_dest_path(path, dest_dir, fmt)) \
+                and cache.is_fresh(path, transform):
+            cache.hits += 1
+            cached.add(path)
+        else:
+            todo.append(path)
+
+    if max_workers == 1:
+        results = (_sav_to_xl_isolated(path, *args, **kwargs) for path in todo)
+        executor = None
+    else:
+        # polars and pyarrow run their own thread pools, which fork can deadlock
+        mp_context = multiprocessing.get_context("spawn")
+        executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=mp_context)
+        futures = [executor.submit(_sav_to_xl_isolated, path, *args, **kwargs) for path in todo]
+        results = (_future_result(future) for future in futures)
+
+    summary = []
+    try:
+        results = iter(results)
+        for i, path in enumerate(paths, 1):
+            name = os.path.basename(path)
+            if path in cached:
+                res = {"status": "cached"}
+            else:
+                res = next(results)
+                if cache is not None:
+                    cache.misses += 1
+                    res["status"] == "ok" and cache.record(path, transform)
+            summary.append({"file": name, **res})
+            if not verbose:
+                continue
+            if res["status"] == "ok":
+                print(f"[{i}/{len(paths)}] {name}: {res['rows']} x {res['cols']}, "
+                      f"{res['dest_bytes']:,} bytes, {res['secs']:.3f} s")
+            else:
+                print(f"[{i}/{len(paths)}] {name}: {res['status']}", res.get("error", ""))
+    finally:
+        executor is None or executor.shutdown(cancel_futures=True)
+
+    schema = {"file": pl.Utf8, "status": pl.Utf8, "rows": pl.Int64, "cols": pl.Int64,
+              "src_bytes": pl.Int64, "dest_bytes": pl.Int64, "secs": pl.Float64,
+              "error": pl.Utf8}
+    summary = pl.DataFrame([{k: row.get(k) for k in schema} for row in summary], schema=schema)
+    if verbose:
+        ok = summary.filter(pl.col("status") == "ok")
+        print(f"Converted {ok.height}/{summary.height} files, "
+              f"{ok['rows'].sum() or 0} rows, {ok['secs'].sum() or 0:.3f} s total")
+        cache is None or print(cache.summary())
+    return summary
 
 # -----------------------------------------------------------------------------
 
-def impute_hd(A: np.ndarray,
-              max_blanks: int | float=0.1,
-              round_to_int: bool=True,
-              verbose: bool=False) -> np.ndarray:
-    """
-    Hot deck imputation.
-
-    :param X: a matrix of numerical values, may contain missing values.
-    :param max_blanks: number or proportion of missing values allowed per row.
-    :param round_to_int: round imputed values to nearest whole number.
-    :returns: the original matrix with eligible missing values imputed.
-
-    >>> impute_hd(np.array([[1,      9],
-    ...                     [1, np.nan]]), 1)
-    array([[ 1.,  9.],
-           [ 1., nan]])
-
-    >>> impute_hd(np.array([[1,      2],
-    ...                     [1,      9],
-    ...                     [1, np.nan]]))
-    array([[ 1.,  2.],
-           [ 1.,  9.],
-           [ 1., nan]])
-
-    >>> impute_hd(np.array([[1,      2],
-    ...                     [1,      9],
-    ...                     [1, np.nan]]), 1)
-    array([[1., 2.],
-           [1., 9.],
-           [1., 6.]])
-
-    >>> impute_hd(np.array([[ 1,      2,      3],
-    ...                     [ 4,      5,      6],
-    ...                     [ 7,      8, np.nan],
-    ...                     [10, np.nan,     12],
-    ...                     [13,     14,     15]]), 1)
-    array([[ 1.,  2.,  3.],
-           [ 4.,  5.,  6.],
-           [ 7.,  8.,  6.],
-           [10., 14., 12.],
-           [13., 14., 15.]])
-    """
-    assert isinstance(A, np.ndarray), "Input must be a numpy.ndarray."
-    assert not np.isinf(A).any(), "Infinite values not supported."
-    _, k = A.shape
-
-    # Check that max_blanks is valid.
-    if isinstance(max_blanks, int) and (0 <= max_blanks <= k):
-        pass
-    elif isinstance(max_blanks, float) and (0.0 <= max_blanks <= 1.0):
-        max_blanks *= k
-    else:
-        msg = f"Invalid max_blanks: {max_blanks = }, {type(max_blanks) = }"
-        raise ValueError(msg)
-
-    # Select rows which can be imputed: 0 < n_blanks <= max_blanks.
-    n_blanks = np.isnan(A).sum(axis=1)
-    imputable = (n_blanks > 0) & (n_blanks <= max_blanks)
-    complete = n_blanks == 0
-    B = A[imputable]
-    C = A[complete]
-    n_imputable = len(B)
-    n_complete = len(C)
-
-    # Return input unchanged if no imputable rows, or too few complete rows.
-    if n_imputable == 0 or n_imputable >= n_complete:
-        verbose and print("Nothing imputed. {n_imputable = }, {n_complete = }")
-        return A
-
-    """
-    Move to 3 dimensions to vectorize the entire operation
-    Details of broadcasting:
-    C (n x k) -> C[np.newaxis, :] (1 x n x k)
-    B (m x k) -> B[:, np.newaxis] (m x 1 x k), where 0 < m < n
-    D (m x n x k)
-    """
-    D = C[np.newaxis, :] - B[:, np.newaxis]  # Takes a while to understand.
-    assert D.shape == (n_imputable, n_complete, k)
-
-    # Calculate sum-of-squares along axis=2 (where the k columns are).
-    ss = np.nansum(np.square(D), axis=2)
-    assert ss.shape == (n_imputable, n_complete)
-
-    # For each imputable row, find the closest row(s) (i.e. minimum ss) among 
-    # the complete rows. If there are multiple closest rows, take the average.
-    is_min_ss = np.isclose(ss, ss.min(axis=1, keepdims=True))
-    E = np.array([C[mask].mean(axis=0) for mask in is_min_ss])
-    if round_to_int:
-        E = np.round(E)
-    assert E.shape == (n_imputable, k)
-
-    # Create imputed rows by filling in blanks with values from closest rows.
-    F = np.nan_to_num(B) + np.isnan(B) * E
-
-    # Insert imputed rows into a copy of the original array.
-    res = np.copy(A)
-    res[imputable] = F
-    return res
-
 IMPUTE_FUNC = impute_hd
 
 # -----------------------------------------------------------------------------
@@ -254,10 +676,70 @@ def impute_wrapper(df: pl.DataFrame, func: Callable=IMPUTE_FUNC, **kwargs) -> np
     Optional:
     - Items arranged in correct order (the algorithm shouldn't care)
     """
-    arr = np.array(df)
+    arr = df.to_numpy()
     res = func(arr, **kwargs)
     return res
 
+def impute_df(df: pl.DataFrame,
+              func: Callable=IMPUTE_FUNC,
+              columns: list[str] | None=None,
+              by: str | list[str] | None=None,
+              max_workers: int | None=1,
+              **kwargs) -> pl.DataFrame:
+    """
+    Like impute_wrapper, but returns df with the columns (default: all numeric
+    columns not in by) replaced by their imputed values. The columns are taken
+    as one Float64 matrix with to_numpy (zero-copy when there are no nulls and
+    the layout allows), nulls as NaN. Names and order are kept, and every
+    column keeps its dtype (e.g. Int8, Float32) when the cast back is lossless.
+    If by is given, each group (e.g. per site) is imputed separately, in up
+    to max_workers threads; numpy releases the GIL for the heavy parts.
+
+    >>> df = pl.DataFrame({'site': ['a', 'a', 'a', 'b', 'b', 'b'],
+    ...                    'x': [1, 2, 1, 1, 2, 1],
+    ...                    'y': [2, 9, None, 4, 7, None]})
+    >>> impute_df(df, max_blanks=1)['y'].to_list()
+    [2, 9, 3, 4, 7, 3]
+
+    >>> res = impute_df(df, by='site', max_workers=2, max_blanks=1)
+    >>> res['y'].to_list(), res.schema == df.schema
+    ([2, 9, 2, 4, 7, 4], True)
+
+    >>> df = df.with_columns(pl.col('y').cast(pl.Float32), pl.col('x').cast(pl.Int8))
+    >>> impute_df(df, by='site', max_blanks=1).schema == df.schema
+    True
+    >>> df = pl.DataFrame({'x': [1, 2, 1, 1], 'y': [0.1, 0.7, None, 0.2]},
+    ...                   schema_overrides={'y': pl.Float32})
+    >>> impute_df(df, max_blanks=1, n_donors=2, round_to_int=False).schema['y']
+    Float64
+    """
+    by = [by] if isinstance(by, str) else list(by or [])
+    if columns is None:
+        columns = [k for k, dtype in df.schema.items() if dtype.is_numeric() and k not in by]
+    X = df.select(pl.col(columns).cast(pl.Float64)).to_numpy()
+
+    if not by:
+        res = func(X, **kwargs)
+    else:
+        groups = (df.select(by).with_row_index("\0i")
+                  .group_by(by, maintain_order=True).agg("\0i")["\0i"].to_list())
+        res = np.array(X)
+        def impute_group(idx: list[int]) -> None:
+            res[idx] = func(X[idx], **kwargs)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            list(executor.map(impute_group, groups))
+
+    imputed = []
+    for j, k in enumerate(columns):
+        col, dtype = res[:, j], df.schema[k]
+        s = pl.Series(k, col, nan_to_null=True)
+        if dtype != pl.Float64:
+            t = s.cast(dtype, strict=False)
+            if t.null_count() == s.null_count() and (t.cast(pl.Float64) == s).all():
+                s = t
+        imputed.append(s)
+    return df.with_columns(imputed)
+
 # -----------------------------------------------------------------------------
 
 def main() -> None:
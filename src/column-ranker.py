@@ -122,19 +122,36 @@ Another approch to consider is dynamic programming
 Last updated: 24 May 2020
 """
 
-import matplotlib.pyplot as plt
+import functools
 import numpy as np
-import pandas as pd
-import seaborn as sns
-from numba import jit
 from timeit import default_timer as timer
 
+# pandas, matplotlib and numba are imported where they are used, so importing
+# this module (e.g. for method_1 or method_2) stays fast.
+
+def lazy_jit(func):
+    """
+    numba.jit(nopython=True, cache=True), applied on the first call: numba is
+    only imported, and func only compiled (or loaded from numba's on-disk
+    cache, next to this file), when it is actually used.
+    """
+    jitted = None
+    @functools.wraps(func)
+    def wrapper(*args):
+        nonlocal jitted
+        if jitted is None:
+            from numba import jit
+            jitted = jit(nopython=True, cache=True)(func)
+        return jitted(*args)
+    return wrapper
+
 class ColumnRanker:
     def __init__(self, wide_df):
         self.df = wide_df
         self.get_all_ranks()
 
     def get_all_ranks(self):
+        import pandas as pd
         methods = {
             "method_1": method_1,
             "method_2": method_2,
@@ -168,6 +185,7 @@ class ColumnRanker:
         self.timings = timings
 
     def viz_all(self):
+        import matplotlib.pyplot as plt
         for k in self.dfs:
             self.viz_survival(k)
         self.viz_overlay()
@@ -178,6 +196,7 @@ class ColumnRanker:
         singular = self.singulars[method]
         timing = self.timings[method]
 
+        import matplotlib.pyplot as plt
         with plt.style.context("seaborn-whitegrid"):
             fig, ax = plt.subplots(figsize=(18, 8), tight_layout=True)
             ax.plot(cumulative, "bx-", label="Cumulative count")
@@ -189,6 +208,7 @@ class ColumnRanker:
         return ax
 
     def viz_overlay(self):
+        import matplotlib.pyplot as plt
         x = range(1, self.df.shape[1] + 1)
         with plt.style.context("seaborn-whitegrid"):
             fig, ax = plt.subplots(figsize=(18, 8), tight_layout=True)
@@ -214,7 +234,7 @@ def method_2(A):
     "Consider pairs of columns"
     return (A.T @ A).sum(axis=0)
 
-@jit(nopython=True)
+@lazy_jit
 def method_3(A):
     "Consider groups of three columns"
     ncol = A.shape[1]
@@ -228,7 +248,7 @@ def method_3(A):
                 (A[:, i] & A[:, j] & A[:, k]).sum()
     return B.sum(axis=0).sum(axis=0)
 
-@jit(nopython=True)
+@lazy_jit
 def method_4(A):
     "Consider groups of four columns"
     ncol = A.shape[1]
@@ -244,7 +264,7 @@ def method_4(A):
                     (A[:, i] & A[:, j] & A[:, k] & A[:, l]).sum()
     return B.sum(axis=0).sum(axis=0).sum(axis=0)
 
-@jit(nopython=True)
+@lazy_jit
 def method_5(A):
     """Keep this around for future development
 
@@ -1,51 +1,230 @@
-#!/usr/bin/env python3
-# cronbachs-alpha-nodep.py
-
-#%% import-libraries
-from itertools import filterfalse
-from math import isnan
-from statistics import variance
-from time import perf_counter
-from typing import List, Union
-
-#%% define-functions
-Number = Union[int, float]
-
-def cronbach_alpha(rows: List[List[Number]]) -> float:
-    """
-    Calculate Cronbach's alpha.
-
-    Parameters
-    ----------
-    rows : List[List[Number]]
-        A list of lists. Each inner list represents a row in a table.
-
-    Returns
-    -------
-    float
-        Cronbach's alpha.
-
-    >>> cronbach_alpha([[1, 1], [2, 2]])
-    1.0
-
-    >>> cronbach_alpha([[1, 1], [1, 2]])
-    0.0
-    
-    >>> round(cronbach_alpha([[1, 1], [1, float("nan")], [1, 3]]), 6)
-    0.285714
-    """
-    k = len(rows[0])
-    colvars = (variance(filterfalse(isnan, col)) for col in zip(*rows))
-    rowsums = (sum(filterfalse(isnan, row)) for row in rows)
-    return (1 - (sum(colvars) / variance(rowsums))) * k / (k - 1)
-
-#%% main
-def main():
-    import doctest
-    t1 = perf_counter()
-    doctest.testmod(verbose=True)
-    t2 = perf_counter()
-    print("Time taken: {:.6f} sec".format(t2 - t1))
-
-if __name__ == "__main__":
-    main()
+#!/usr/bin/env python3
+# cronbachs-alpha-nodep.py
+
+#%% import-libraries
+from array import array
+from itertools import chain, compress, islice
+from math import fsum, nan
+from operator import and_, mul
+from time import perf_counter
+from typing import Iterable, Iterator, List, Sequence, Union
+
+#%% define-functions
+Number = Union[int, float]
+
+def cronbach_alpha(rows: List[List[Number]]) -> float:
+    """
+    Calculate Cronbach's alpha.
+
+    Parameters
+    ----------
+    rows : List[List[Number]]
+        A list of lists. Each inner list represents a row in a table.
+
+    Returns
+    -------
+    float
+        Cronbach's alpha.
+
+    >>> cronbach_alpha([[1, 1], [2, 2]])
+    1.0
+
+    >>> cronbach_alpha([[1, 1], [1, 2]])
+    0.0
+    
+    >>> round(cronbach_alpha([[1, 1], [1, float("nan")], [1, 3]]), 6)
+    0.0
+
+    Missing values are handled by pairwise deletion, as in
+    cronbachs-alpha-mindep.py, which gives 0.996 for this too:
+
+    >>> nan = float("nan")
+    >>> round(cronbach_alpha([[1, 2, 3], [2, nan, 4], [3, 4, 5], [4, 5, 7], [5, 5, 6]]), 6)
+    0.996
+    """
+    return cronbach_alpha_stream(rows)
+
+def to_float(v: Union[Number, str]) -> float:
+    return float(v) if v != "" else nan
+
+class ColumnStats:
+    """
+    Sums and sums of squares of each column and of the row totals, for rows
+    without missing values: O(k) per row. Values are shifted by the first
+    row, and each batch's sums are kept, to be added up with math.fsum at the
+    end, so precision is not lost to cancellation or to the totals growing
+    large.
+    """
+    def __init__(self, k: int):
+        self.k = k
+        self.n = 0
+        self.shift = None
+        self.sums = [[] for _ in range(k + 1)]  # The last one is the row totals.
+        self.sumsqs = [[] for _ in range(k + 1)]
+
+    def update(self, batch: List[List[float]]) -> bool:
+        """Add batch, or return False (adding nothing) if it has a missing value."""
+        totals = [sum(row) for row in batch]
+        total = sum(totals)
+        if total != total:
+            return False
+        if self.shift is None:
+            self.shift = list(batch[0])
+            self.shift.append(sum(self.shift))
+        cols = list(zip(*batch))
+        cols.append(totals)
+        for i, (col, c) in enumerate(zip(cols, self.shift)):
+            d = [v - c for v in col]
+            self.sums[i].append(sum(d))
+            self.sumsqs[i].append(sum(map(mul, d, d)))
+        self.n += len(batch)
+        return True
+
+    def variances(self) -> List[float]:
+        """Sample variances of the k columns, then of the row totals."""
+        res = []
+        for sums, sumsqs in zip(self.sums, self.sumsqs):
+            s, q = fsum(sums), fsum(sumsqs)
+            res.append((q - s * s / self.n) / (self.n - 1) if self.n > 1 else nan)
+        return res
+
+    def alpha(self) -> float:
+        *colvars, totalvar = self.variances()
+        return (1 - fsum(colvars) / totalvar) * self.k / (self.k - 1)
+
+class PairwiseCovariance:
+    """
+    Pairwise-complete covariance matrix of a stream of batches of rows, in
+    one pass: for each pair of columns, the number of rows where both are
+    observed, the sum of each over those rows, and the sum of their products,
+    all taken column-wise per batch (shifted, as in ColumnStats). Rows with
+    missing values are summed with those set to 0, using the observed masks
+    for the counts and the pairwise sums.
+    """
+    def __init__(self, k: int):
+        self.k = k
+        self.shift = None
+        self.n = [0] * (k * k)
+        self.sums = [[] for _ in range(k * k)]  # Sum of column i, where j is also observed.
+        self.cross = [[] for _ in range(k * k)]
+
+    def add(self, i: int, j: int, n: int, si: float, sj: float, cross: float) -> None:
+        for ij, s in ((i * self.k + j, si), (j * self.k + i, sj))[:1 if i == j else 2]:
+            self.n[ij] += n
+            self.sums[ij].append(s)
+            self.cross[ij].append(cross)
+
+    def update(self, batch: List[List[float]]) -> None:
+        k = self.k
+        if self.shift is None:
+            self.shift = [next((v for v in col if v == v), 0.0) for col in zip(*batch)]
+        complete, incomplete = [], []
+        for row in batch:
+            total = sum(row)
+            (complete if total == total else incomplete).append(row)
+
+        if complete:
+            cols = [[v - c for v in col] for col, c in zip(zip(*complete), self.shift)]
+            col_sums = [sum(col) for col in cols]
+            for i in range(k):
+                for j in range(i, k):
+                    self.add(i, j, len(complete), col_sums[i], col_sums[j],
+                             sum(map(mul, cols[i], cols[j])))
+
+        if incomplete:
+            masks = [[v == v for v in col] for col in zip(*incomplete)]
+            cols = [[v - c if v == v else 0.0 for v in col]
+                    for col, c in zip(zip(*incomplete), self.shift)]
+            for i in range(k):
+                for j in range(i, k):
+                    self.add(i, j, sum(map(and_, masks[i], masks[j])),
+                             sum(compress(cols[i], masks[j])), sum(compress(cols[j], masks[i])),
+                             sum(map(mul, cols[i], cols[j])))
+
+    def covariance(self) -> List[List[float]]:
+        k = self.k
+        S = [[nan] * k for _ in range(k)]
+        for i in range(k):
+            for j in range(k):
+                n = self.n[i * k + j]
+                if n > 1:
+                    si, sj = fsum(self.sums[i * k + j]), fsum(self.sums[j * k + i])
+                    S[i][j] = (fsum(self.cross[i * k + j]) - si * sj / n) / (n - 1)
+        return S
+
+    def alpha(self) -> float:
+        S = self.covariance()
+        trace = fsum(S[i][i] for i in range(self.k))
+        total = fsum(x for row in S for x in row)
+        return (1 - trace / total) * self.k / (self.k - 1)
+
+def iter_batches(rows: Iterable[Sequence[Union[Number, str]]],
+                 batch_size: int) -> Iterator[List[List[float]]]:
+    """Lists of batch_size rows of floats ("" as NaN)."""
+    rows = iter(rows)
+    while (batch := list(islice(rows, batch_size))):
+        try:
+            yield [list(map(float, row)) for row in batch]
+        except ValueError:
+            yield [list(map(to_float, row)) for row in batch]
+
+def cronbach_alpha_stream(rows: Iterable[Sequence[Union[Number, str]]],
+                          batch_size: int=10_000) -> float:
+    """
+    Calculate Cronbach's alpha in one pass over rows (see below), which can be any
+    iterator of rows, e.g. a csv.reader (after its header). Strings are
+    converted with float, and "" or NaN is missing.
+
+    While no value is missing, only the column and row total sums are kept
+    (ColumnStats, O(k) per row). From the first missing value on, alpha is
+    computed from the pairwise-complete covariance matrix S instead (see
+    PairwiseCovariance), as (1 - trace(S) / sum(S)) * k / (k - 1), like
+    cronbachs-alpha-mindep.py. The rows before it are then read again if
+    rows is a sequence, or, for an iterator, replayed from a compact copy
+    (8 bytes per value) kept until the first missing value.
+
+    >>> import csv, io
+    >>> reader = csv.reader(io.StringIO("a,b\\n1,1\\n2,3\\n3,2\\n4,5\\n1,\\n"))
+    >>> header = next(reader)
+    >>> round(cronbach_alpha_stream(reader, batch_size=2), 6)
+    0.885312
+    >>> round(cronbach_alpha_stream([[1, 1], [2, 3], [3, 2], [4, 5], [1, nan]], batch_size=2), 6)
+    0.885312
+    >>> cronbach_alpha_stream([])
+    Traceback (most recent call last):
+    ...
+    ValueError: cronbach_alpha_stream needs at least one row
+    """
+    one_shot = iter(rows) is rows
+    stats, cov, kept = None, None, []
+    for batch in iter_batches(rows, batch_size):
+        if stats is None:
+            stats = ColumnStats(len(batch[0]))
+        if cov is None:
+            if stats.update(batch):
+                one_shot and kept.append(array("d", chain.from_iterable(batch)))
+                continue
+            cov = PairwiseCovariance(stats.k)
+            if one_shot:
+                k = stats.k
+                for values in kept:
+                    cov.update([values[i:i + k].tolist() for i in range(0, len(values), k)])
+                kept = None
+            else:
+                for done in iter_batches(islice(rows, stats.n), batch_size):
+                    cov.update(done)
+        cov.update(batch)
+    if stats is None:
+        raise ValueError("cronbach_alpha_stream needs at least one row")
+    return stats.alpha() if cov is None else cov.alpha()
+
+#%% main
+def main():
+    import doctest
+    t1 = perf_counter()
+    doctest.testmod(verbose=True)
+    t2 = perf_counter()
+    print("Time taken: {:.6f} sec".format(t2 - t1))
+
+if __name__ == "__main__":
+    main()
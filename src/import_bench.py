@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# import_bench.py
+
+"""
+Import-time benchmark: import each module in a fresh interpreter, report the
+best wall time over a few runs, and fail (exit 1) if a module is over its time
+budget or pulls in a heavy dependency that it should only import when used.
+
+    python src/import_bench.py
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# path (from the repo root): (budget in seconds, modules that must not be loaded)
+IMPORT_BUDGETS = {
+    "reference-tmp.py": (1.5, ("pyreadstat", "xlsxwriter", "pyarrow", "pandas")),
+    "src/column-ranker.py": (0.5, ("pandas", "matplotlib", "seaborn", "numba")),
+    "src/impute_hd.py": (0.5, ()),
+    "src/util.py": (0.5, ("numpy", "pandas", "polars")),
+    "src/template.py": (0.2, ("numpy", "pandas", "polars")),
+    "ffp/logreg.py": (0.5, ()),
+}
+
+PROBE = """
+import importlib.util, json, sys, time
+t1 = time.perf_counter()
+spec = importlib.util.spec_from_file_location("probe", sys.argv[1])
+module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(module)
+print(json.dumps({"secs": time.perf_counter() - t1, "modules": list(sys.modules)}))
+"""
+
+def time_import(path: str, repeats: int=3) -> (float, set[str]):
+    """
+    Best import time of path over repeats fresh interpreters, and the
+    top-level modules loaded. Raises ImportError if the import fails.
+    """
+    best, modules = float("inf"), set()
+    for _ in range(repeats):
+        proc = subprocess.run([sys.executable, "-c", PROBE, path], capture_output=True, text=True)
+        if proc.returncode != 0:
+            raise ImportError(proc.stderr.strip().splitlines()[-1])
+        res = json.loads(proc.stdout)
+        best = min(best, res["secs"])
+        modules = {m.split(".")[0] for m in res["modules"]}
+    return best, modules
+
+def check_imports(budgets: dict=IMPORT_BUDGETS, repeats: int=3, scale: float=1.0) -> list[str]:
+    """Print a line per module, and return a list of failures."""
+    failures = []
+    for path, (budget, forbidden) in budgets.items():
+        try:
+            secs, modules = time_import(os.path.join(ROOT, path), repeats)
+        except ImportError as e:
+            print(f"FAIL {path:<24} {e}")
+            failures.append(f"{path}: {e}")
+            continue
+        loaded = sorted(set(forbidden) & modules)
+        ok = secs <= budget * scale and not loaded
+        print(f"{'ok' if ok else 'FAIL':>4} {path:<24} {secs:.3f} s (budget {budget * scale:.3f} s)",
+              f"loaded: {', '.join(loaded)}" if loaded else "")
+        if secs > budget * scale:
+            failures.append(f"{path}: {secs:.3f} s > {budget * scale:.3f} s")
+        if loaded:
+            failures.append(f"{path}: loaded {', '.join(loaded)} at import")
+    return failures
+
+def setup_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        description=__doc__)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--scale", type=float, default=1.0,
+        help="multiply every budget, e.g. on a slow machine")
+    return parser
+
+def main() -> None:
+    args = setup_parser().parse_args()
+    failures = check_imports(repeats=args.repeats, scale=args.scale)
+    if failures:
+        print("\n".join(failures), file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
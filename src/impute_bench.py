@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# impute_bench.py
+
+"""
+Imputation benchmark: mask values in complete matrices (synthetic, or the
+complete rows of a CSV/NPY file), impute them with each backend, and compare
+against the held-out truth, with wall time and peak memory, over a grid of
+sizes, missingness patterns and rates.
+
+    python impute_bench.py --sizes 1000x10 5000x20 --rates 0.01 0.05
+"""
+
+import argparse
+import csv
+import time
+import tracemalloc
+from functools import partial
+from typing import Callable
+
+import numpy as np
+
+from impute_hd import impute_hd
+
+def synthetic(n: int, k: int, levels: int=5, seed: int | None=0) -> np.ndarray:
+    """
+    n x k Likert-type items (1..levels) driven by one latent factor, so
+    columns are correlated and there is something for a donor to match on.
+
+    >>> X = synthetic(100, 4)
+    >>> X.shape, X.min().item(), X.max().item(), bool(np.isnan(X).any())
+    ((100, 4), 1.0, 5.0, False)
+    """
+    rng = np.random.default_rng(seed)
+    latent = rng.normal(size=(n, 1))
+    noise = rng.normal(scale=0.7, size=(n, k))
+    cuts = np.linspace(-1.5, 1.5, levels - 1)
+    return np.searchsorted(cuts, latent + noise).astype(float) + 1
+
+def mask_mcar(X: np.ndarray, rate: float, seed: int | None=0) -> np.ndarray:
+    """
+    Missing completely at random: every cell is missing with probability rate.
+
+    >>> M = mask_mcar(np.zeros((1000, 10)), 0.1)
+    >>> M.shape, round(float(M.mean()), 2)
+    ((1000, 10), 0.1)
+    """
+    rng = np.random.default_rng(seed)
+    return rng.random(X.shape) < rate
+
+def mask_mar(X: np.ndarray, rate: float, seed: int | None=0, driver: int=0) -> np.ndarray:
+    """
+    Missing at random: the driver column is always observed, and a cell in
+    another column is missing with probability proportional to the rank of
+    the row's driver value, rate on average.
+
+    >>> X = synthetic(2000, 5)
+    >>> M = mask_mar(X, 0.1)
+    >>> bool(M[:, 0].any()), round(float(M[:, 1:].mean()), 2)
+    (False, 0.1)
+    >>> high = X[:, 0] > np.median(X[:, 0])
+    >>> bool(M[high, 1:].mean() > M[~high, 1:].mean())
+    True
+    """
+    rng = np.random.default_rng(seed)
+    n, k = X.shape
+    rank = np.argsort(np.argsort(X[:, driver], kind="stable")) / (n - 1)
+    p = np.clip(2 * rate * rank, 0, 1)
+    M = rng.random((n, k)) < p[:, np.newaxis]
+    M[:, driver] = False
+    return M
+
+PATTERNS = {"mcar": mask_mcar, "mar": mask_mar}
+
+def evaluate(truth: np.ndarray, imputed: np.ndarray, mask: np.ndarray) -> dict:
+    """
+    Compare imputed to truth over the masked cells that were filled in.
+
+    >>> truth = np.array([[1., 2.], [3., 4.]])
+    >>> imputed = np.array([[1., 4.], [np.nan, 4.]])
+    >>> mask = np.array([[False, True], [True, True]])
+    >>> evaluate(truth, imputed, mask)
+    {'coverage': 0.6667, 'rmse': 1.4142, 'accuracy': 0.5}
+    """
+    filled = mask & ~np.isnan(imputed)
+    err = imputed[filled] - truth[filled]
+    n = filled.sum()
+    return {"coverage": round(float(n / mask.sum()), 4) if mask.any() else np.nan,
+            "rmse": round(float(np.sqrt(np.mean(np.square(err)))), 4) if n else np.nan,
+            "accuracy": round(float(np.mean(err == 0)), 4) if n else np.nan}
+
+def impute_mean(A: np.ndarray) -> np.ndarray:
+    """Baseline: fill every missing value with its column mean, rounded."""
+    return np.where(np.isnan(A), np.round(np.nanmean(A, axis=0)), A)
+
+BACKENDS = {
+    "hd": partial(impute_hd, max_blanks=0.2),
+    "hd_scaled": partial(impute_hd, max_blanks=0.2, scale=True),
+    "knn5": partial(impute_hd, max_blanks=0.2, n_donors=5),
+    "knn5_dist": partial(impute_hd, max_blanks=0.2, n_donors=5, weights="distance"),
+    "col_mean": impute_mean,
+}
+
+def run_one(func: Callable, A: np.ndarray) -> (np.ndarray, float, float):
+    """Run func(A), returning the result, wall time (s) and peak memory (MiB)."""
+    tracemalloc.start()
+    t1 = time.perf_counter()
+    res = func(A)
+    secs = time.perf_counter() - t1
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return res, secs, peak / 2**20
+
+def run_benchmark(backends: dict[str, Callable]=BACKENDS,
+                  sizes: list[tuple[int, int]]=[(1000, 10)],
+                  patterns: list[str]=["mcar", "mar"],
+                  rates: list[float]=[0.01, 0.05],
+                  X: np.ndarray | None=None,
+                  repeats: int=1,
+                  seed: int=0,
+                  verbose: bool=True) -> list[dict]:
+    """
+    One result row per backend, size, pattern, rate and repeat. If X is
+    given, its complete rows are resampled to each size (first k columns),
+    otherwise synthetic data are used.
+    """
+    if X is not None:
+        X = X[~np.isnan(X).any(axis=1)]
+    results = []
+    for n, k in sizes:
+        for r in range(repeats):
+            if X is None:
+                truth = synthetic(n, k, seed=seed + r)
+            else:
+                rng = np.random.default_rng(seed + r)
+                truth = X[rng.choice(len(X), n, replace=n > len(X)), :k]
+            for pattern in patterns:
+                for rate in rates:
+                    mask = PATTERNS[pattern](truth, rate, seed=seed + r)
+                    masked = np.where(mask, np.nan, truth)
+                    for name, func in backends.items():
+                        imputed, secs, peak = run_one(func, masked)
+                        row = {"backend": name, "n": n, "k": k, "pattern": pattern,
+                               "rate": rate, "repeat": r,
+                               **evaluate(truth, imputed, mask),
+                               "secs": round(secs, 4), "peak_mib": round(peak, 2)}
+                        results.append(row)
+                        verbose and print_row(row, header=len(results) == 1)
+    return results
+
+COLUMNS = ("backend", "n", "k", "pattern", "rate", "repeat",
+           "coverage", "rmse", "accuracy", "secs", "peak_mib")
+
+def print_row(row: dict, header: bool=False) -> None:
+    if header:
+        print(" ".join(f"{c:>10}" for c in COLUMNS))
+    print(" ".join(f"{row[c]:>10}" for c in COLUMNS))
+
+def load_matrix(path: str) -> np.ndarray:
+    """A numeric matrix from .npy, or from .csv with a header row."""
+    if path.endswith(".npy"):
+        return np.load(path).astype(float)
+    return np.genfromtxt(path, delimiter=",", skip_header=1)
+
+def setup_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        description=__doc__)
+    parser.add_argument("--input", help="CSV/NPY matrix to resample, instead of synthetic data")
+    parser.add_argument("--sizes", nargs="+", default=["1000x10", "5000x20"],
+        help="sizes as NxK")
+    parser.add_argument("--patterns", nargs="+", default=list(PATTERNS), choices=list(PATTERNS))
+    parser.add_argument("--rates", nargs="+", type=float, default=[0.01, 0.05])
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=list(BACKENDS))
+    parser.add_argument("--repeats", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--csv", help="also write the results to this CSV file")
+    parser.add_argument("-t", "--run-tests", action="store_true", help="run tests")
+    return parser
+
+def main() -> None:
+    args = setup_parser().parse_args()
+    if args.run_tests:
+        import doctest
+        doctest.testmod(verbose=True)
+        return
+    sizes = [tuple(map(int, s.lower().split("x"))) for s in args.sizes]
+    results = run_benchmark(
+        backends={name: BACKENDS[name] for name in args.backends},
+        sizes=sizes, patterns=args.patterns, rates=args.rates,
+        X=None if args.input is None else load_matrix(args.input),
+        repeats=args.repeats, seed=args.seed)
+    if args.csv:
+        with open(args.csv, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=COLUMNS)
+            writer.writeheader()
+            writer.writerows(results)
+
+if __name__ == "__main__":
+    main()
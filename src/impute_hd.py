@@ -3,16 +3,174 @@
 
 import numpy as np
 
+WEIGHTS = ("uniform", "distance")
+CHUNK_CELLS = 2**22
+
+def prepare_donors(C: np.ndarray,
+                   scale: np.ndarray | bool | None=None,
+                   rows: np.ndarray | None=None) -> tuple:
+    """
+    The donor side of sq_dists, so it can be computed once and reused across
+    blocks of B: (mu, scale, D), with mu the column means of C (or of
+    C[rows], read without an intermediate copy), and D = [C^2 | C], C
+    centred on mu and divided by scale, in one n x 2k float array. If scale
+    is True, it is each column's standard deviation (1 where that is 0).
+    """
+    n, k = (len(C) if rows is None else len(rows)), C.shape[1]
+    D = np.empty((n, 2 * k))
+    C_sq, C0 = D[:, :k], D[:, k:]
+    if rows is None:
+        C0[:] = C
+    else:
+        step = 4096  # In blocks of rows: np.take(out=C0) would buffer a full copy.
+        for i in range(0, n, step):
+            C0[i:i + step] = C[rows[i:i + step]]
+    mu = C0.mean(axis=0)
+    C0 -= mu
+    np.square(C0, out=C_sq)
+    if scale is True:
+        scale = np.sqrt(C_sq.mean(axis=0))
+        scale[scale == 0] = 1
+    if scale is not None:
+        C0 /= scale
+        C_sq /= np.square(scale)
+    return mu, scale, D
+
+def sq_dists(B: np.ndarray,
+             C: np.ndarray,
+             scale: np.ndarray | None=None,
+             donors: tuple | None=None) -> np.ndarray:
+    """
+    Squared Euclidean distances between the rows of B (m x k, may contain
+    NaN, which are skipped) and the rows of C (n x k, complete), optionally
+    with each column divided by scale. Computed with matrix products, as
+    sum(M * (C - B)^2) = M @ (C^2).T - 2 * B0 @ C.T + sum(B0^2), where M is
+    the observed mask of B and B0 is B with NaN set to 0, so the m x n x k
+    differences are never materialised (the first two terms are one product,
+    [M | -2 * B0] @ D.T, with D from prepare_donors). Both are first centred on the column
+    means of C, so large offsets (e.g. ID-like columns) don't cancel out.
+    donors is prepare_donors(C, scale), if already computed (C and scale are
+    then not used).
+
+    >>> sq_dists(np.array([[0, np.nan], [1, 1]]), np.array([[0, 5], [3, 1]]))
+    array([[ 0.,  9.],
+           [17.,  4.]])
+
+    >>> B = np.array([[1e9 + 1, np.nan], [1e9 + 3, 2]])
+    >>> C = np.array([[1e9, 0], [1e9 + 4, 3], [1e9 + 2, 1]])
+    >>> exact = np.nansum(np.square(C - B[:, np.newaxis]), axis=2)
+    >>> exact.tolist(), np.allclose(sq_dists(B, C), exact, rtol=0, atol=1e-6)
+    ([[1.0, 9.0, 1.0], [13.0, 2.0, 2.0]], True)
+    """
+    if donors is None:
+        donors = prepare_donors(C, scale)
+    mu, scale, D = donors
+    B = B - mu
+    if scale is not None:
+        B /= scale
+    M = ~np.isnan(B)
+    B0 = np.where(M, B, 0)
+    ss = np.hstack([M, -2 * B0]) @ D.T
+    ss += np.square(B0).sum(axis=1, keepdims=True)
+    return np.maximum(ss, 0, out=ss)
+
+def donor_values(ss: np.ndarray,
+                 C: np.ndarray,
+                 n_donors: int | None=None,
+                 weights: str="uniform",
+                 draw: bool=False,
+                 seed: int | np.random.Generator | None=None,
+                 rows: np.ndarray | None=None) -> np.ndarray:
+    """
+    Donor values for each row of ss (m x n squared distances to the rows of C,
+    or if rows is given, to the rows C[rows], which are then the only ones read).
+
+    If n_donors is None, the mean of the closest row(s) of C (ties averaged).
+    Otherwise, the n_donors closest rows, weighted uniformly or by inverse
+    distance (exact matches take all the weight): either their weighted mean,
+    or if draw, one of them drawn with probability proportional to its weight.
+
+    >>> C = np.array([[0., 0.], [1., 10.], [3., 30.]])
+    >>> ss = np.array([[0., 1., 9.], [4., 1., 1.]])
+    >>> donor_values(ss, C)
+    array([[ 0.,  0.],
+           [ 2., 20.]])
+    >>> donor_values(ss, C, 2, "distance")
+    array([[ 0.,  0.],
+           [ 2., 20.]])
+    >>> donor_values(ss, C, 3, "distance")[1]
+    array([ 1.6, 16. ])
+    >>> donor_values(ss[:, :2], C, rows=np.array([2, 1]))
+    array([[ 3., 30.],
+           [ 1., 10.]])
+
+    Draws are reproducible with a seed, and only from the n_donors closest:
+
+    >>> ss = np.tile([[4., 0., 1.]], (1000, 1))
+    >>> drawn = donor_values(ss, C, 2, draw=True, seed=0)
+    >>> np.array_equal(drawn, donor_values(ss, C, 2, draw=True, seed=0))
+    True
+    >>> np.unique(drawn, axis=0).tolist()
+    [[1.0, 10.0], [3.0, 30.0]]
+    """
+    if weights not in WEIGHTS:
+        raise ValueError(f"Invalid weights: {weights!r}, expected one of {WEIGHTS}")
+    if draw and n_donors is None:
+        raise ValueError("draw needs n_donors")
+    m, n = ss.shape
+    if n_donors is None:
+        # If there are multiple closest rows, take the average.
+        # np.isclose to the row minimum, without its m x n float temporaries.
+        min_ss = ss.min(axis=1, keepdims=True)
+        is_min_ss = ss <= min_ss + (1e-8 + 1e-5 * min_ss)
+        r, j = np.nonzero(is_min_ss)
+        E = np.zeros((m, C.shape[1]))
+        np.add.at(E, r, C[j if rows is None else rows[j]])
+        return E / is_min_ss.sum(axis=1, keepdims=True)
+
+    n_donors = min(n_donors, n)
+    idx = np.argpartition(ss, n_donors - 1, axis=1)[:, :n_donors]
+    donors = idx if rows is None else rows[idx]
+    if weights == "uniform":
+        w = np.ones(idx.shape)
+    else:
+        with np.errstate(divide="ignore"):
+            w = 1 / np.sqrt(np.take_along_axis(ss, idx, axis=1))
+        exact = np.isinf(w).any(axis=1)
+        w[exact] = np.isinf(w[exact])
+
+    if draw:
+        rng = np.random.default_rng(seed)
+        cum = np.cumsum(w, axis=1)
+        u = rng.random((m, 1)) * cum[:, -1:]
+        choice = np.minimum((cum <= u).sum(axis=1), n_donors - 1)
+        return C[donors[np.arange(m), choice]]
+    return np.einsum("md,mdk->mk", w, C[donors]) / w.sum(axis=1, keepdims=True)
+
 def impute_hd(A: np.ndarray,
               max_blanks: int | float=0.1,
               round_to_int: bool=True,
-              verbose: bool=False) -> np.ndarray:
+              verbose: bool=False,
+              n_donors: int | None=None,
+              weights: str="uniform",
+              draw: bool=False,
+              seed: int | None=None,
+              scale: bool=False,
+              out: np.ndarray | None=None,
+              inplace: bool=False) -> np.ndarray:
     """
     Hot deck imputation.
 
     :param X: a matrix of numerical values, may contain missing values.
     :param max_blanks: number or proportion of missing values allowed per row.
     :param round_to_int: round imputed values to nearest whole number.
+    :param n_donors: use the n_donors nearest complete rows (k-NN) instead of
+        only the closest one(s). See donor_values for weights, draw and seed.
+    :param scale: standardise each column by its standard deviation over the
+        complete rows before computing distances.
+    :param out: write the result into this array (e.g. a np.memmap) of the
+        same shape, instead of a new copy.
+    :param inplace: write the imputed values into X itself (out=X).
     :returns: the original matrix with eligible missing values imputed.
 
     >>> impute_hd(np.array([[1,      9],
@@ -44,10 +202,37 @@ def impute_hd(A: np.ndarray,
            [ 7.,  8.,  6.],
            [10., 14., 12.],
            [13., 14., 15.]])
+
+    Unscaled, the wide column decides the donor; scaled, both columns count.
+
+    >>> A = np.array([[0,  50,      1],
+    ...               [1,  70,      2],
+    ...               [0, 150,      3],
+    ...               [1, 200,      4],
+    ...               [1,  55, np.nan]])
+    >>> float(impute_hd(A, 1)[-1, -1]), float(impute_hd(A, 1, scale=True)[-1, -1])
+    (1.0, 2.0)
+
+    >>> impute_hd(A, 1, n_donors=2, round_to_int=False)[-1].tolist()
+    [1.0, 55.0, 1.5]
+
+    >>> impute_hd(A, 1, draw=True)
+    Traceback (most recent call last):
+    ...
+    ValueError: draw needs n_donors
+
+    >>> res = impute_hd(A, 1, inplace=True)
+    >>> res is A, A[-1].tolist()
+    (True, [1.0, 55.0, 1.0])
     """
     assert isinstance(A, np.ndarray), "Input must be a numpy.ndarray."
     assert not np.isinf(A).any(), "Infinite values not supported."
     _, k = A.shape
+    if inplace:
+        out = A
+    if out is not None and out is not A:
+        assert out.shape == A.shape, "out must have the same shape as the input."
+        np.copyto(out, A)
 
     # Check that max_blanks is valid.
     if isinstance(max_blanks, int) and (0 <= max_blanks <= k):
@@ -57,49 +242,51 @@ def impute_hd(A: np.ndarray,
     else:
         msg = f"Invalid max_blanks: {max_blanks = }, {type(max_blanks) = }"
         raise ValueError(msg)
+    if draw and n_donors is None:
+        raise ValueError("draw needs n_donors")
 
     # Select rows which can be imputed: 0 < n_blanks <= max_blanks.
     n_blanks = np.isnan(A).sum(axis=1)
     imputable = (n_blanks > 0) & (n_blanks <= max_blanks)
     complete = n_blanks == 0
     B = A[imputable]
-    C = A[complete]
     n_imputable = len(B)
-    n_complete = len(C)
+    n_complete = int(complete.sum())
 
     # Return input unchanged if no imputable rows, or too few complete rows.
     if n_imputable == 0 or n_imputable >= n_complete:
-        verbose and print("Nothing imputed. {n_imputable = }, {n_complete = }")
-        return A
+        verbose and print(f"Nothing imputed. {n_imputable = }, {n_complete = }")
+        return A if out is None else out
 
-    """
-    Move to 3 dimensions to vectorize the entire operation
-    Details of broadcasting:
-    C (n x k) -> C[np.newaxis, :] (1 x n x k)
-    B (m x k) -> B[:, np.newaxis] (m x 1 x k), where 0 < m < n
-    D (m x n x k)
-    """
-    D = C[np.newaxis, :] - B[:, np.newaxis]  # Takes a while to understand.
-    assert D.shape == (n_imputable, n_complete, k)
-
-    # Calculate sum-of-squares along axis=2 (where the k columns are).
-    ss = np.nansum(np.square(D), axis=2)
-    assert ss.shape == (n_imputable, n_complete)
-
-    # For each imputable row, find the closest row(s) (i.e. minimum ss) among 
-    # the complete rows. If there are multiple closest rows, take the average.
-    is_min_ss = np.isclose(ss, ss.min(axis=1, keepdims=True))
-    E = np.array([C[mask].mean(axis=0) for mask in is_min_ss])
-    if round_to_int:
-        E = np.round(E)
-    assert E.shape == (n_imputable, k)
-
-    # Create imputed rows by filling in blanks with values from closest rows.
-    F = np.nan_to_num(B) + np.isnan(B) * E
-
-    # Insert imputed rows into a copy of the original array.
-    res = np.copy(A)
-    res[imputable] = F
+    # The donors are copied once, centred, scaled and squared (in place).
+    # Donor values are read back from A, only for the rows selected.
+    donor_rows = np.flatnonzero(complete)
+    donors = prepare_donors(A, scale or None, donor_rows)
+    rng = np.random.default_rng(seed)
+
+    # Fill in blanks into a copy of the original array unless out is given.
+    # Imputable rows are done in blocks, so the block x n_complete distance
+    # matrix stays around CHUNK_CELLS, and only the blank cells are written.
+    res = np.copy(A) if out is None else out
+    rows = np.flatnonzero(imputable)
+    chunk = max(1, CHUNK_CELLS // n_complete)
+    for i in range(0, n_imputable, chunk):
+        Bi = B[i:i + chunk]
+
+        # Squared distances from each imputable row to each complete row,
+        # over the columns the imputable row has.
+        ss = sq_dists(Bi, None, donors=donors)
+        assert ss.shape == (len(Bi), n_complete)
+
+        # For each imputable row, find the closest row(s) among the complete rows.
+        E = donor_values(ss, A, n_donors, weights, draw, rng, donor_rows)
+        del ss  # Before the next block's is allocated.
+        if round_to_int:
+            E = np.round(E)
+        assert E.shape == (len(Bi), k)
+
+        r, c = np.nonzero(np.isnan(Bi))
+        res[rows[i + r], c] = E[r, c]
     return res
 
 if __name__ == "__main__":
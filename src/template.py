@@ -11,7 +11,13 @@ template.py
 
 #%% import-libraries
 import argparse
+import atexit
+import functools
 import logging
+import logging.handlers
+import os
+import queue
+import reprlib
 import sys
 import time
 import unittest
@@ -30,31 +36,58 @@ def setup_parser() -> argparse.ArgumentParser:
         help="run tests")
     return parser
 
-def setup_logger(log_level: str="INFO", log_file: str=None) -> logging.Logger:
+def _teardown_logger(logger: logging.Logger) -> None:
+    """Stop the queue listener and remove (and close) the handlers setup_logger added."""
+    listener = getattr(logger, "_template_listener", None)
+    if listener is not None:
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+        logger._template_listener = None
+    for handler in [h for h in logger.handlers if getattr(h, "_template_handler", False)]:
+        logger.removeHandler(handler)
+        handler.close()
+
+def setup_logger(log_level: str="INFO", log_file: str=None, use_queue: bool=False) -> logging.Logger:
+    """Setup logger. Calling again replaces (rather than stacks) the handlers."""
     logger = logging.getLogger(__name__)
     logger.setLevel(log_level)
+    _teardown_logger(logger)
 
     log_fmt = "%(asctime)s %(levelname)8s: %(message)s"
     formatter = logging.Formatter(log_fmt)
 
-    stream_handler = logging.StreamHandler()
-    stream_handler.setFormatter(formatter)
-    logger.addHandler(stream_handler)
-
+    handlers = [logging.StreamHandler()]
     if log_file is not None:
-        os.makedirs(os.path.dirname(log_file), exist_ok=True)
-        file_handler = logging.FileHandler(log_file)
-        file_handler.setFormatter(formatter)
-        logger.addHandler(file_handler)
+        os.makedirs(os.path.dirname(log_file) or ".", exist_ok=True)
+        handlers.append(logging.FileHandler(log_file))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    if use_queue:
+        # Do the I/O in a background thread, hot loops only enqueue records.
+        q = queue.SimpleQueue()
+        listener = logging.handlers.QueueListener(q, *handlers)
+        listener.start()
+        logger._template_listener = listener
+        if not getattr(logger, "_template_atexit", False):
+            atexit.register(_teardown_logger, logger)
+            logger._template_atexit = True
+        handlers = [logging.handlers.QueueHandler(q)]
+
+    for handler in handlers:
+        handler._template_handler = True
+        logger.addHandler(handler)
     return logger
 
 def timer(f):
+    @functools.wraps(f)
     def wrapper(*args, **kwargs):
         t1 = time.perf_counter()
         result = f(*args, **kwargs)
         t2 = time.perf_counter()
         print("Function:", f.__name__)
-        print("Arguments:", args, kwargs)
+        print("Arguments:", reprlib.repr(args), reprlib.repr(kwargs))
         print("Time taken: {:.6f} secs".format(t2 - t1))
         return result
     return wrapper
@@ -73,6 +106,19 @@ class TestMod(unittest.TestCase):
         want = 8, 9, 10
         self.assertEqual(got, want)
 
+    def test_setup_logger(self):
+        import tempfile
+        with tempfile.TemporaryDirectory() as tmp:
+            log_file = os.path.join(tmp, "a.log")
+            logger = setup_logger(use_queue=True)
+            logger = setup_logger(log_level="DEBUG", log_file=log_file, use_queue=True)
+            self.assertEqual(len(logger.handlers), 1)
+            logger.debug("hello")
+            _teardown_logger(logger)
+            self.assertEqual(logger.handlers, [])
+            with open(log_file) as f:
+                self.assertIn("hello", f.read())
+
 
 
 #%% main
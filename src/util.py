@@ -7,46 +7,226 @@
 
 from __future__ import annotations
 
+import atexit
+import contextlib
 import csv
+import functools
 import getpass
 import hashlib
+import inspect
+import io
+import json
 import logging
+import logging.handlers
 import netrc
 import os
+import queue
+import reprlib
+import shutil
 import sqlite3
 import tempfile
+import threading
 import time
+import tracemalloc
 import urllib
 import unittest
+import unittest.mock
+from concurrent.futures import ThreadPoolExecutor
 
 def timer(func):
+    @functools.wraps(func)
     def wrapper(*args, **kwargs):
         t1 = time.perf_counter()
         result = func(*args, **kwargs)
         t2 = time.perf_counter()
         print("\nFunction:", func.__name__)
-        print("Arguments:", args, kwargs)
+        print("Arguments:", reprlib.repr(args), reprlib.repr(kwargs))
         print(f"Time taken: {t2 - t1:.6f} secs")
         return result
     return wrapper
 
-def setup_logger(name: str | None=None, log_level: str="INFO", log_file: str | None=None) -> logging.Logger:
-    """Setup logger."""
+PROFILE_ENV_VAR = "UTIL_PROFILE"
+_profile_stats: dict[str, dict] = {}
+_profile_lock = threading.Lock()
+_profile_local = threading.local()
+
+class profile(contextlib.ContextDecorator):
+    """
+    Record wall time, CPU time, call count and (optionally) peak memory into an
+    in-process registry. Use as @profile() or `with profile("name"):`.
+
+    Enabled by the environment variable UTIL_PROFILE ("1" for timings, "mem" to
+    also trace memory). When disabled, the decorator returns the function
+    unchanged and the context manager does nothing.
+    """
+    def __init__(self, name: str | None=None, memory: bool | None=None):
+        mode = os.environ.get(PROFILE_ENV_VAR, "").strip().lower()
+        self.enabled = mode not in {"", "0", "false", "no", "off"}
+        self.memory = mode == "mem" if memory is None else memory
+        self.name = name
+
+    def __call__(self, func):
+        if not self.enabled:
+            return func
+        if self.name is None:
+            self.name = f"{func.__module__}.{func.__qualname__}"
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with self:
+                return func(*args, **kwargs)
+        return wrapper
+
+    def __enter__(self):
+        if not self.enabled:
+            return self
+        stack = _profile_local.__dict__.setdefault("stack", [])
+        frame = {"memory": self.memory, "started": False}
+        if self.memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                frame["started"] = True
+            current, peak = tracemalloc.get_traced_memory()
+            if stack and stack[-1]["memory"]:
+                stack[-1]["peak"] = max(stack[-1]["peak"], peak)
+            tracemalloc.reset_peak()
+            frame["m0"] = frame["peak"] = current
+        stack.append(frame)
+        frame["c0"] = time.process_time()
+        frame["t0"] = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if not self.enabled:
+            return False
+        t1 = time.perf_counter()
+        c1 = time.process_time()
+        stack = _profile_local.stack
+        frame = stack.pop()
+        peak = None
+        if frame["memory"]:
+            peak = max(frame["peak"], tracemalloc.get_traced_memory()[1])
+            if stack and stack[-1]["memory"]:
+                stack[-1]["peak"] = max(stack[-1]["peak"], peak)
+            if frame["started"]:
+                tracemalloc.stop()
+            peak -= frame["m0"]
+        wall, cpu = t1 - frame["t0"], c1 - frame["c0"]
+        with _profile_lock:
+            stats = _profile_stats.setdefault(self.name or "<anonymous>", {
+                "calls": 0, "wall": 0.0, "cpu": 0.0, "wall_max": 0.0, "peak_mem": None})
+            stats["calls"] += 1
+            stats["wall"] += wall
+            stats["cpu"] += cpu
+            stats["wall_max"] = max(stats["wall_max"], wall)
+            if peak is not None:
+                stats["peak_mem"] = max(stats["peak_mem"] or 0, peak)
+        return False
+
+def profile_stats() -> dict[str, dict]:
+    """Snapshot of the profile registry (times in secs, peak_mem in bytes)."""
+    with _profile_lock:
+        return {k: dict(v) for k, v in _profile_stats.items()}
+
+def reset_profile() -> None:
+    with _profile_lock:
+        _profile_stats.clear()
+
+def profile_to_json(path: str | None=None) -> str:
+    """Export the profile registry as JSON, optionally writing it to path."""
+    res = json.dumps(profile_stats(), indent=2)
+    if path is not None:
+        with open(path, "w") as f:
+            f.write(res)
+    return res
+
+def log_profile(logger: logging.Logger | None=None, log_level: str="INFO") -> None:
+    """Log one line per profiled function, slowest first."""
+    logger = logger or logging.getLogger(__name__)
+    level = logging.getLevelName(log_level)
+    rows = sorted(profile_stats().items(), key=lambda kv: -kv[1]["wall"])
+    for name, st in rows:
+        mem = "" if st["peak_mem"] is None else f", peak {st['peak_mem'] / 2**20:.3f} MiB"
+        logger.log(level, f"{name}: {st['calls']} calls, wall {st['wall']:.6f} s, "
+                          f"cpu {st['cpu']:.6f} s{mem}")
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line, for log aggregation."""
+    def format(self, record: logging.LogRecord) -> str:
+        dct = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            dct["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(dct)
+
+def _teardown_logger(logger: logging.Logger) -> None:
+    """Remove (and close) handlers previously installed by setup_logger."""
+    listener = getattr(logger, "_util_listener", None)
+    if listener is not None:
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+        logger._util_listener = None
+    for handler in [h for h in logger.handlers if getattr(h, "_util_handler", False)]:
+        logger.removeHandler(handler)
+        handler.close()
+
+def setup_logger(name: str | None=None,
+                 log_level: str="INFO",
+                 log_file: str | None=None,
+                 use_queue: bool=False,
+                 max_bytes: int=0,
+                 backup_count: int=0,
+                 json_format: bool=False) -> logging.Logger:
+    """
+    Setup logger. Calling again replaces (rather than stacks) the handlers.
+
+    :param use_queue: hand records to a background thread (QueueListener) so
+        the calling thread never blocks on terminal or disk I/O.
+    :param max_bytes: rotate log_file when it reaches this size (0: never).
+    :param backup_count: number of rotated log files to keep.
+    :param json_format: emit one JSON object per line instead of plain text.
+    """
     if name is None:
         name = __name__
     logger = logging.getLogger(name)
     logger.setLevel(log_level)
-    formatter = logging.Formatter("%(asctime)s %(levelname)8s: %(message)s")
+    _teardown_logger(logger)
+    if json_format:
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter("%(asctime)s %(levelname)8s: %(message)s")
 
-    stream_handler = logging.StreamHandler()
-    stream_handler.setFormatter(formatter)
-    logger.addHandler(stream_handler)
+    handlers = [logging.StreamHandler()]
 
     if log_file is not None:
-        os.makedirs(os.path.dirname(log_file), exist_ok=True)
-        file_handler = logging.FileHandler(log_file)
-        file_handler.setFormatter(formatter)
-        logger.addHandler(file_handler)
+        if os.path.dirname(log_file):
+            os.makedirs(os.path.dirname(log_file), exist_ok=True)
+        if max_bytes > 0:
+            handlers.append(logging.handlers.RotatingFileHandler(
+                log_file, maxBytes=max_bytes, backupCount=backup_count))
+        else:
+            handlers.append(logging.FileHandler(log_file))
+
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    if use_queue:
+        q = queue.SimpleQueue()
+        listener = logging.handlers.QueueListener(q, *handlers, respect_handler_level=True)
+        listener.start()
+        logger._util_listener = listener
+        if not getattr(logger, "_util_atexit", False):
+            atexit.register(_teardown_logger, logger)
+            logger._util_atexit = True
+        handlers = [logging.handlers.QueueHandler(q)]
+
+    for handler in handlers:
+        handler._util_handler = True
+        logger.addHandler(handler)
 
     return logger
 
@@ -56,19 +236,65 @@ def to_abspath(path: str) -> str:
         return path
     return os.path.realpath(f"__file__/../{path}")
 
-def md5sum(x: bytes | str, literal_string: bool=False) -> str:
-    """Calculate MD5 sum of string, bytes, or file."""
+def hashsum(x: bytes | str, algorithm: str="md5", literal_string: bool=False, chunk_size: int | None=None) -> str:
+    """Calculate hash of string, bytes, or file. Files are streamed in chunks."""
     if isinstance(x, bytes):
-        return hashlib.md5(x).hexdigest()
+        return hashlib.new(algorithm, x).hexdigest()
     elif isinstance(x, str):
         if os.path.isfile(x) and not literal_string:
             with open(x, "rb") as f:
-                return hashlib.md5(f.read()).hexdigest()
+                if chunk_size is None and hasattr(hashlib, "file_digest"):
+                    return hashlib.file_digest(f, algorithm).hexdigest()
+                h = hashlib.new(algorithm)
+                while (chunk := f.read(chunk_size or 1 << 20)):
+                    h.update(chunk)
+                return h.hexdigest()
         else:
-            return hashlib.md5(x.encode()).hexdigest()
+            return hashlib.new(algorithm, x.encode()).hexdigest()
     else:
         raise ValueError(f"'{x}' is neither bytes, string, nor file.")
 
+def md5sum(x: bytes | str, literal_string: bool=False) -> str:
+    """Calculate MD5 sum of string, bytes, or file."""
+    return hashsum(x, "md5", literal_string=literal_string)
+
+def hash_files(paths: list[str], algorithm: str="md5", max_workers: int | None=None) -> dict[str, str]:
+    """Hash many files concurrently (hashlib releases the GIL on large reads)."""
+    f = lambda path: hashsum(path, algorithm)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return dict(zip(paths, executor.map(f, paths)))
+
+def write_manifest(src_dir: str, manifest_path: str, algorithm: str="md5", max_workers: int | None=None, verbose: bool=False) -> dict[str, str]:
+    """Write a checksum manifest ('<digest>  <relpath>', as md5sum/sha256sum do) for all files under a directory."""
+    manifest_path = os.path.realpath(manifest_path)
+    paths = sorted(
+        os.path.join(root, name)
+        for root, _, names in os.walk(src_dir)
+        for name in names
+        if os.path.realpath(os.path.join(root, name)) != manifest_path
+    )
+    digests = hash_files(paths, algorithm, max_workers)
+    manifest = {os.path.relpath(k, src_dir).replace(os.sep, "/"): v for k, v in digests.items()}
+    with open(manifest_path, "w") as f:
+        f.writelines(f"{v}  {k}\n" for k, v in manifest.items())
+    if verbose:
+        print(f"File written: '{manifest_path}'")
+    return manifest
+
+def read_manifest(manifest_path: str) -> dict[str, str]:
+    """Read a checksum manifest into a dict mapping relpath to digest."""
+    with open(manifest_path) as f:
+        rows = (line.rstrip("\n").split("  ", 1) for line in f if line.strip())
+        return {k: v for v, k in rows}
+
+def diff_manifest(old: dict[str, str], new: dict[str, str]) -> dict[str, list[str]]:
+    """Compare two manifests; report added, removed, and changed files."""
+    return {
+        "added": sorted(new.keys() - old.keys()),
+        "removed": sorted(old.keys() - new.keys()),
+        "changed": sorted(k for k in old.keys() & new.keys() if old[k] != new[k]),
+    }
+
 def get_userpass(url: str, user: str=None, passwd: str=None) -> tuple:
     """Get username and password for given URL."""
     if user is None:
@@ -87,13 +313,17 @@ def get_userpass(url: str, user: str=None, passwd: str=None) -> tuple:
         passwd = getpass.getpass(f"Enter password for user '{user}': ")
     return user, passwd
 
+def db_table_names(db_path: str) -> list[str]:
+    """List the tables in a SQLite database."""
+    with sqlite3.connect(db_path) as conn:
+        query = "SELECT name FROM sqlite_master WHERE type = 'table';"
+        return [row[0] for row in conn.execute(query)]
+
 def read_db(db_path: str, table_names: list[str] | None=None) -> dict[str, list]:
     """Read tables from SQLite database."""
     with sqlite3.connect(db_path) as conn:
         if table_names is None:
-            query = "SELECT name FROM sqlite_master WHERE type = 'table';"
-            cur = conn.execute(query)
-            table_names = cur.fetchone()
+            table_names = db_table_names(db_path)
         elif isinstance(table_names, str):
             table_names = [table_names]
         tables = {}
@@ -113,9 +343,131 @@ def write_csv(dcts: list[dict], dest_path: str, verbose: bool=False) -> None:
     if verbose:
         print(f"File written: '{dest_path}'")
 
-def db_to_csv(db_path: str, csv_dir: str, verbose: bool=False) -> None:
+class BuildCache:
+    """
+    Persistent (SQLite) manifest of source files and the transforms applied to
+    them, so unchanged conversions can be skipped on re-runs.
+
+    A source is considered unchanged if its size and mtime match the record, or
+    failing that, if its content hash does. The transform identity covers the
+    function's name and source code, the source of the functions it calls from
+    its own module, any deps, and its extra arguments, so editing any of these
+    forces a re-run.
+    """
+    def __init__(self, db_path: str, algorithm: str="md5"):
+        self.db_path = db_path
+        self.algorithm = algorithm
+        self.hits = 0
+        self.misses = 0
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        with sqlite3.connect(db_path) as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS manifest ("
+                "src_path TEXT, transform TEXT, size INTEGER, mtime_ns INTEGER, "
+                "digest TEXT, PRIMARY KEY (src_path, transform));")
+
+    @staticmethod
+    def _source(func) -> str:
+        try:
+            return inspect.getsource(func)
+        except (OSError, TypeError):
+            return repr(getattr(getattr(func, "__code__", None), "co_code", None))
+
+    @staticmethod
+    def _callees(func) -> list:
+        """Functions from func's own module that it refers to, recursively."""
+        found, todo = {}, [func]
+        while todo:
+            f = inspect.unwrap(todo.pop())
+            names, codes = set(), [getattr(f, "__code__", None)]
+            while codes:
+                code = codes.pop()
+                if code is not None:
+                    names.update(code.co_names)
+                    codes += [c for c in code.co_consts if inspect.iscode(c)]
+            for name in sorted(names - set(found)):
+                obj = getattr(f, "__globals__", {}).get(name)
+                if inspect.isfunction(obj) and obj is not func and obj.__module__ == func.__module__:
+                    found[name] = obj
+                    todo.append(obj)
+        return [found[name] for name in sorted(found)]
+
+    @classmethod
+    def transform_id(cls, func, *args, deps: tuple=(), **kwargs) -> str:
+        """
+        Identify a transform by name, source code (its own and its callees'
+        in the same module), and arguments. deps are anything else the output
+        depends on: callables from other modules, or values (e.g. a version).
+        """
+        ident = lambda x: cls.transform_id(x) if callable(x) else repr(x)
+        parts = [f"{func.__module__}.{func.__qualname__}", cls._source(func)]
+        parts += [cls._source(callee) for callee in cls._callees(func)]
+        parts += [f"dep:{ident(dep)}" for dep in deps]
+        parts += [ident(arg) for arg in args]
+        parts += [f"{k}={ident(v)}" for k, v in sorted(kwargs.items())]
+        return md5sum("\n".join(parts), literal_string=True)
+
+    def is_fresh(self, src_path: str, transform: str) -> bool:
+        """Check if transform was already applied to the current src_path."""
+        src_path = os.path.realpath(src_path)
+        query = "SELECT size, mtime_ns, digest FROM manifest WHERE src_path = ? AND transform = ?;"
+        with sqlite3.connect(self.db_path) as conn:
+            row = conn.execute(query, (src_path, transform)).fetchone()
+        if row is None:
+            return False
+        size, mtime_ns, digest = row
+        st = os.stat(src_path)
+        if (st.st_size, st.st_mtime_ns) == (size, mtime_ns):
+            return True
+        if st.st_size != size or hashsum(src_path, self.algorithm) != digest:
+            return False
+        self.record(src_path, transform)  # Touched but unchanged.
+        return True
+
+    def record(self, src_path: str, transform: str) -> None:
+        """Record that transform was applied to the current src_path."""
+        src_path = os.path.realpath(src_path)
+        st = os.stat(src_path)
+        digest = hashsum(src_path, self.algorithm)
+        query = "INSERT OR REPLACE INTO manifest VALUES (?, ?, ?, ?, ?);"
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute(query, (src_path, transform, st.st_size, st.st_mtime_ns, digest))
+
+    def run(self, func, src_path: str, *args, outputs: list[str] | None=None, verbose: bool=False,
+            deps: tuple=(), untracked: dict | None=None, **kwargs):
+        """
+        Call func(src_path, *args, **kwargs) unless it has already been applied
+        to an unchanged src_path and all expected outputs still exist.
+        untracked are extra keyword arguments for func that do not affect its
+        output (e.g. its own verbose), so they are left out of the transform id.
+        """
+        transform = self.transform_id(func, *args, deps=deps, **kwargs)
+        outputs_ok = all(os.path.exists(path) for path in outputs or [])
+        if outputs_ok and self.is_fresh(src_path, transform):
+            self.hits += 1
+            if verbose:
+                print(f"Skipped (unchanged): '{src_path}'")
+            return None
+        self.misses += 1
+        result = func(src_path, *args, **kwargs, **(untracked or {}))
+        self.record(src_path, transform)
+        return result
+
+    def summary(self) -> str:
+        return f"Cache hits: {self.hits}, misses: {self.misses}"
+
+def db_to_csv(db_path: str, csv_dir: str, verbose: bool=False, cache: BuildCache | None=None) -> None:
     """Dump tables from SQLite database into CSV files."""
     today = time.strftime("%Y-%m-%d")
+    if cache is not None:
+        outputs = [os.path.join(csv_dir, f"{table_name}_{today}.csv")
+                   for table_name in db_table_names(db_path)]
+        cache.run(db_to_csv, db_path, csv_dir, outputs=outputs, verbose=verbose,
+                  untracked={"verbose": verbose})
+        if verbose:
+            print(cache.summary())
+        return None
     tables = read_db(db_path)
     os.makedirs(csv_dir, exist_ok=True)
     for table_name, rows in tables.items():
@@ -179,10 +531,107 @@ if __name__ == "__main__":
             f = md5sum
             self.assertEqual(f("test1"), "5a105e8b9d40e1329780d62ea2265d8a")
             self.assertEqual(f(b"test2"), "ad0234829205b9033196ba818f7a872b")
-            # with tempfile.NamedTemporaryFile() as fp:
-            #     fp.write(b"test3")
-            #     fp.seek(0)
-            #     self.assertEqual(f(fp.name), "8ad8757baa8564dc136c1e07507f4a98")
+            with tempfile.NamedTemporaryFile() as fp:
+                fp.write(b"test3")
+                fp.flush()
+                self.assertEqual(f(fp.name), "8ad8757baa8564dc136c1e07507f4a98")
+
+        def test_hashsum(self):
+            f = hashsum
+            self.assertEqual(f("test1"), md5sum("test1"))
+            self.assertEqual(f(b"test2", "sha256"), hashlib.sha256(b"test2").hexdigest())
+            with tempfile.NamedTemporaryFile() as fp:
+                fp.write(b"test3" * 1000)
+                fp.flush()
+                want = hashlib.blake2b(b"test3" * 1000).hexdigest()
+                self.assertEqual(f(fp.name, "blake2b"), want)
+                self.assertEqual(f(fp.name, "blake2b", chunk_size=7), want)
+
+        def test_manifest(self):
+            with tempfile.TemporaryDirectory() as d:
+                os.makedirs(os.path.join(d, "sub"))
+                for name, data in [("a.txt", b"a"), ("sub/b.txt", b"b")]:
+                    with open(os.path.join(d, name), "wb") as fp:
+                        fp.write(data)
+                path = os.path.join(d, "MANIFEST.md5")
+                old = write_manifest(d, path)
+                self.assertEqual(old, {"a.txt": md5sum(b"a"), "sub/b.txt": md5sum(b"b")})
+                self.assertEqual(read_manifest(path), old)
+                with open(os.path.join(d, "a.txt"), "wb") as fp:
+                    fp.write(b"A")
+                new = write_manifest(d, path, max_workers=2)
+                want = {"added": [], "removed": [], "changed": ["a.txt"]}
+                self.assertEqual(diff_manifest(old, new), want)
+
+        def test_build_cache(self):
+            calls = []
+            def transform(src_path, n=1):
+                calls.append(src_path)
+            with tempfile.TemporaryDirectory() as d:
+                src = os.path.join(d, "src.txt")
+                with open(src, "w") as fp:
+                    fp.write("a")
+                cache = BuildCache(os.path.join(d, "cache", "build.db"))
+                cache.run(transform, src)
+                cache.run(transform, src)
+                self.assertEqual((cache.hits, cache.misses), (1, 1))
+                os.utime(src, ns=(0, 0))
+                cache.run(transform, src)
+                self.assertEqual((cache.hits, cache.misses), (2, 1))
+                cache.run(transform, src, n=2)
+                cache.run(transform, src, outputs=[os.path.join(d, "missing")])
+                self.assertEqual((cache.hits, cache.misses), (2, 3))
+                with open(src, "w") as fp:
+                    fp.write("b")
+                cache = BuildCache(os.path.join(d, "cache", "build.db"))
+                cache.run(transform, src)
+                self.assertEqual((cache.hits, cache.misses), (0, 1))
+                self.assertEqual(len(calls), 4)
+                cache.run(transform, src, deps=("v2",))
+                self.assertEqual((cache.hits, cache.misses), (0, 2))
+
+        def test_build_cache_callees(self):
+            self.assertIn(read_db, BuildCache._callees(db_to_csv))
+            self.assertIn(db_table_names, BuildCache._callees(db_to_csv))
+            with tempfile.TemporaryDirectory() as d:
+                db_path = os.path.join(d, "data.db")
+                with sqlite3.connect(db_path) as conn:
+                    conn.execute("CREATE TABLE t1 (a INTEGER);")
+                    conn.execute("CREATE TABLE t2 (b TEXT);")
+                    conn.execute("INSERT INTO t1 VALUES (1);")
+                    conn.execute("INSERT INTO t2 VALUES ('x');")
+                csv_dir = os.path.join(d, "csv")
+                cache = BuildCache(os.path.join(d, "cache", "build.db"))
+                db_to_csv(db_path, csv_dir, cache=cache)
+                self.assertEqual(len(os.listdir(csv_dir)), 2)
+                shutil.rmtree(csv_dir)
+                with contextlib.redirect_stdout(io.StringIO()) as out:
+                    db_to_csv(db_path, csv_dir, verbose=True, cache=cache)
+                self.assertEqual(out.getvalue().count("File written"), 2)
+                self.assertEqual(len(os.listdir(csv_dir)), 2)
+                db_to_csv(db_path, csv_dir, cache=cache)
+                self.assertEqual((cache.hits, cache.misses), (1, 2))
+
+        def test_profile(self):
+            with unittest.mock.patch.dict(os.environ, {PROFILE_ENV_VAR: ""}):
+                f = lambda: None
+                self.assertIs(profile()(f), f)
+            reset_profile()
+            with unittest.mock.patch.dict(os.environ, {PROFILE_ENV_VAR: "mem"}):
+                @profile()
+                def alloc(n):
+                    return len(bytearray(n))
+                with profile("outer"):
+                    for _ in range(3):
+                        alloc(2**20)
+            stats = profile_stats()
+            inner = stats[f"{__name__}.{alloc.__qualname__}"]
+            self.assertEqual(inner["calls"], 3)
+            self.assertGreaterEqual(inner["peak_mem"], 2**20)
+            self.assertGreaterEqual(stats["outer"]["peak_mem"], 2**20)
+            self.assertGreaterEqual(stats["outer"]["wall"], inner["wall"])
+            self.assertFalse(tracemalloc.is_tracing())
+            self.assertEqual(json.loads(profile_to_json())["outer"]["calls"], 1)
 
         def test_seconds_to_dhms(self):
             f = seconds_to_dhms
@@ -206,6 +655,26 @@ if __name__ == "__main__":
 
         def test_setup_logger(self):
             self.assertIsInstance(setup_logger(), logging.Logger)
+            logger = setup_logger("test_setup_logger")
+            logger = setup_logger("test_setup_logger")
+            self.assertEqual(len(logger.handlers), 1)
+
+        def test_setup_logger_queue(self):
+            with tempfile.TemporaryDirectory() as d:
+                log_file = os.path.join(d, "logs", "test.log")
+                logger = setup_logger("test_setup_logger_queue", log_file=log_file,
+                                      use_queue=True, max_bytes=200,
+                                      backup_count=2, json_format=True)
+                self.assertEqual(len(logger.handlers), 1)
+                self.assertIsInstance(logger.handlers[0], logging.handlers.QueueHandler)
+                for i in range(10):
+                    logger.info(f"message {i}")
+                _teardown_logger(logger)  # Flushes the queue.
+                self.assertEqual(logger.handlers, [])
+                with open(log_file) as f:
+                    records = [json.loads(line) for line in f]
+                self.assertEqual(records[-1]["message"], "message 9")
+                self.assertTrue(os.path.exists(f"{log_file}.1"))
 
     print("\nRunning tests:")
     unittest.main()
@@ -2,15 +2,68 @@
 
 import numpy as np
 import pandas as pd
-import win32com.client as win32
 from pathlib import Path
 from time import strftime
 
-def xlsx_template(df, dd, filepath, add_date=True):
+def dated_path(filepath, add_date=True):
     fp = Path(filepath)
     if add_date:
         filename = "{}_{}{}".format(fp.stem, strftime("%Y%m%d"), fp.suffix)
         fp = fp.with_name(filename)
+    return fp
+
+def estimate_widths(df, min_width=4, max_width=60, date_width=10):
+    """
+    Column widths (in characters) roughly matching Excel's AutoFit: the longest
+    of the header and the values as strings, one vectorised pass per column.
+    Dates are written as YYYY-MM-DD, so their width is fixed.
+    """
+    widths = []
+    for name, s in df.items():
+        if pd.api.types.is_datetime64_any_dtype(s):
+            n = date_width
+        else:
+            n = s.dropna().astype(str).str.len().max()
+            n = 0 if pd.isna(n) else n
+        widths.append(max(n, len(str(name))) + 2)
+    return np.clip(widths, min_width, max_width).tolist()
+
+def xlsx_template(df, dd, filepath, add_date=True):
+    """
+    Write df and dd to the Data and DataDict sheets, with bold, left-aligned,
+    unwrapped headers, frozen panes and estimated column widths, in a single
+    xlsxwriter pass (no Excel needed).
+    """
+    fp = dated_path(filepath, add_date)
+
+    df = df.reset_index()
+    dd = dd.reset_index()
+
+    with pd.ExcelWriter(fp, engine="xlsxwriter", datetime_format="YYYY-MM-DD") as f:
+        header_fmt = f.book.add_format({"bold": True, "align": "left", "text_wrap": False})
+
+        df.to_excel(f, sheet_name="Data", index=None, freeze_panes=(1, 1))
+        s1 = f.sheets["Data"]
+        s1.write_row(0, 0, [str(c) for c in df.columns], header_fmt)
+        for i, width in enumerate(estimate_widths(df)):
+            s1.set_column(i, i, width)
+
+        dd.to_excel(f, sheet_name="DataDict", index=None, freeze_panes=(1, 0))
+        s2 = f.sheets["DataDict"]
+        s2.write_row(0, 0, [str(c) for c in dd.columns], header_fmt)
+        s2.set_column(0, 0, 30)
+        s2.set_column(1, 1, 40)
+
+    return fp
+
+def xlsx_template_win32(df, dd, filepath, add_date=True):
+    """
+    The original version: write with pandas, then re-open the workbook in
+    Excel (Windows only) to style the headers and AutoFit the columns.
+    """
+    import win32com.client as win32
+
+    fp = dated_path(filepath, add_date)
 
     df = df.reset_index()
     dd = dd.reset_index()